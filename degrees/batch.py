@@ -0,0 +1,149 @@
+"""
+Answers many degrees-of-separation queries in one run.
+
+Each line of the queries file holds two people, as names or IMDb ids,
+separated by a comma (CSV quoting is allowed). Queries are grouped by
+source so a single BFS tree answers every target of that source, and the
+groups are spread over a process pool. Workers are forked after the graph
+is loaded, so they share it copy-on-write instead of reloading it.
+
+Results are written as one JSON object per line, in completion order;
+the "line" field gives the query's line number in the input file.
+
+Usage: python batch.py directory queries [--workers N] [--output FILE]
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from resolver import NameIndex
+from snapshot import open_graph
+
+# Graph shared with forked workers
+graph = None
+
+# NameIndex used to suggest candidates for unresolved names
+name_index = None
+
+
+def resolve(value):
+    """
+    Returns (person index, error) for a name or IMDb id. The error is None
+    when the person was found unambiguously, else a dictionary with an
+    error message and, if a NameIndex is loaded, ranked candidates.
+    """
+    value = value.strip()
+    if value in graph.person_index:
+        return graph.person_index[value], None
+    matches = graph.names.get(value.lower(), [])
+    if len(matches) == 1:
+        return matches[0], None
+
+    if len(matches) == 0:
+        error = {"error": f"Person not found: {value}"}
+    else:
+        ids = ", ".join(graph.person_ids[p] for p in matches)
+        error = {"error": f"Ambiguous name: {value} (ids {ids})"}
+    if name_index is not None:
+        error["candidates"] = name_index.resolve(value, limit=5)
+    return None, error
+
+
+def read_queries(path):
+    """
+    Reads the queries file. Returns a dictionary mapping each source index
+    to a list of (line, target index) pairs, and a list of error records
+    for lines that could not be resolved.
+    """
+    groups = {}
+    errors = []
+    with open(path, encoding="utf-8") as f:
+        for line, row in enumerate(csv.reader(f), start=1):
+            if not row or not "".join(row).strip():
+                continue
+            if len(row) != 2:
+                errors.append({"line": line, "error": "Expected two people per line"})
+                continue
+            source, source_error = resolve(row[0])
+            target, target_error = resolve(row[1])
+            if source_error or target_error:
+                errors.append({"line": line, **(source_error or target_error)})
+                continue
+            groups.setdefault(source, []).append((line, target))
+    return groups, errors
+
+
+def answer_group(group):
+    """
+    Runs one BFS for a source and returns a result record for every query.
+    """
+    source, queries = group
+    paths = graph.shortest_index_paths(source, [target for _, target in queries])
+    records = []
+    for line, target in queries:
+        record = {
+            "line": line,
+            "source": graph.person_ids[source],
+            "target": graph.person_ids[target],
+        }
+        path = paths.get(target)
+        if path is None:
+            record["degrees"] = None
+            record["path"] = None
+        else:
+            record["degrees"] = len(path)
+            record["path"] = [list(pair) for pair in graph.path_to_ids(path)]
+        records.append(record)
+    return records
+
+
+def answer_queries(groups, workers=None):
+    """
+    Yields lists of result records, one list per source group, fanning the
+    groups out over a pool of forked workers.
+    """
+    if workers == 1 or len(groups) <= 1:
+        for group in groups.items():
+            yield answer_group(group)
+        return
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap_unordered(answer_group, groups.items())
+
+
+def main():
+    global graph, name_index
+
+    parser = argparse.ArgumentParser(description="Batch degrees of separation queries.")
+    parser.add_argument("directory")
+    parser.add_argument("queries")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    graph = open_graph(args.directory)
+    name_index = NameIndex(graph)
+    print("Data loaded.", file=sys.stderr)
+
+    groups, errors = read_queries(args.queries)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record in errors:
+            out.write(json.dumps(record) + "\n")
+        for records in answer_queries(groups, args.workers):
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
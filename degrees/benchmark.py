@@ -0,0 +1,328 @@
+"""
+Benchmarks for the degrees loaders and searches.
+
+    python benchmark.py compare directory [--pairs N] [--seed S]
+        Compares people expanded by each search strategy on a dataset.
+
+    python benchmark.py generate directory --edges N [--seed S]
+        Writes a synthetic dataset with a power-law distribution of movies
+        per person, in the same CSV layout as `small` and `large`.
+
+    python benchmark.py run [--sizes N ...] [--output report.json]
+        Generates a dataset for every size, times load_data,
+        neighbors_for_person and shortest_path for every strategy,
+        measures the memory each loader leaves allocated (a snapshot's
+        mapped pages are not counted), and writes a JSON report that can
+        be diffed between releases.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+import degrees
+import graph
+import resolver
+import snapshot
+
+REPORT_VERSION = 1
+
+# Strategy name -> (compact graph, bidirectional search)
+STRATEGIES = {
+    "bfs": (False, False),
+    "bidirectional": (False, True),
+    "compact_bfs": (True, False),
+    "compact_bidirectional": (True, True),
+}
+
+# Above this many edges the dict loader and its searches are skipped
+# unless --all-strategies is given, since they take too long to be useful
+DICT_EDGE_LIMIT = 10 ** 6
+
+# Synthetic names are two or three of these syllables per part, so they
+# share trigrams about as unevenly as real names do
+SYLLABLES = (
+    "al", "an", "ar", "be", "bri", "ca", "cha", "da", "del", "don", "el", "en",
+    "fa", "ga", "gor", "ha", "is", "ja", "jo", "ka", "la", "le", "li", "lo",
+    "ma", "mar", "mi", "mo", "na", "ne", "ni", "no", "o", "pa", "ra", "ri",
+    "ro", "sa", "se", "son", "ta", "ter", "to", "va", "vi", "wil", "ya", "zo",
+)
+
+# Fuzzy name lookups timed per dataset by benchmark_dataset
+FUZZY_QUERIES = 200
+
+
+def generate_dataset(directory, edges, seed=0, cast_size=6, new_person=0.3):
+    """
+    Writes people.csv, movies.csv and stars.csv with roughly `edges` star
+    rows. Each cast member is a new person with probability new_person,
+    else the star of a uniformly chosen earlier edge, so people are picked
+    in proportion to how many movies they already have (preferential
+    attachment) and movies per person follow a power law.
+    Returns (people, movies, edges) counts.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    edge_people = array("i")
+    num_people = 0
+    num_movies = 0
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as movies_file, \
+            open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as stars_file:
+        movies_writer = csv.writer(movies_file)
+        stars_writer = csv.writer(stars_file)
+        movies_writer.writerow(["id", "title", "year"])
+        stars_writer.writerow(["person_id", "movie_id"])
+
+        while len(edge_people) < edges:
+            movie = num_movies
+            num_movies += 1
+            movies_writer.writerow([movie, f"Movie {movie}", rng.randint(1920, 2020)])
+            cast = set()
+            for _ in range(rng.randint(1, 2 * cast_size - 1)):
+                if num_people == 0 or not edge_people or rng.random() < new_person:
+                    person = num_people
+                    num_people += 1
+                else:
+                    person = edge_people[rng.randrange(len(edge_people))]
+                if person in cast:
+                    continue
+                cast.add(person)
+                edge_people.append(person)
+                stars_writer.writerow([person, movie])
+                if len(edge_people) >= edges:
+                    break
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(num_people):
+            writer.writerow([person, synthetic_name(rng), rng.randint(1900, 2010)])
+
+    return num_people, num_movies, len(edge_people)
+
+
+def synthetic_name(rng):
+    """
+    Returns a random "First Last" name made of SYLLABLES.
+    """
+    parts = ("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(2))
+    return " ".join(part.capitalize() for part in parts)
+
+
+def clear_dict_data():
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+
+
+def timed(function, *args):
+    """
+    Returns (result, seconds) of calling function.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def traced_memory(function, *args):
+    """
+    Returns (result, bytes) of calling function, where bytes is what it
+    left allocated according to tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def run_pairs(pairs, bidirectional):
+    """
+    Runs shortest_path on every pair with the loaded data. Returns the total
+    people expanded, the total seconds and each pair's path length.
+    """
+    stats = {"expanded": 0}
+    lengths = []
+    start = time.perf_counter()
+    for source, target in pairs:
+        path = degrees.shortest_path(source, target, bidirectional, stats)
+        lengths.append(None if path is None else len(path))
+    return stats["expanded"], time.perf_counter() - start, lengths
+
+
+def time_neighbors(person_ids):
+    _, seconds = timed(lambda: [degrees.neighbors_for_person(p) for p in person_ids])
+    return seconds / max(len(person_ids), 1)
+
+
+def time_fuzzy(star_graph, rng):
+    """
+    Times NameIndex.fuzzy on FUZZY_QUERIES names of the graph with one
+    character dropped. Returns the mean and maximum seconds per query.
+    """
+    index = resolver.NameIndex(star_graph)
+    seconds = []
+    for _ in range(FUZZY_QUERIES):
+        name = rng.choice(star_graph.person_names)
+        i = rng.randrange(len(name))
+        _, elapsed = timed(index.fuzzy, name[:i] + name[i + 1:])
+        seconds.append(elapsed)
+    return {"mean": sum(seconds) / len(seconds), "max": max(seconds)}
+
+
+def benchmark_dataset(directory, num_pairs, seed, strategies):
+    """
+    Times loading and searching one dataset directory with every strategy.
+    Returns a report dictionary.
+    """
+    report = {"load_seconds": {}, "memory_bytes": {}, "neighbors_seconds": {}, "search": {}}
+
+    rng = random.Random(seed)
+    person_ids = []
+    for compact in sorted({compact for compact, _ in strategies.values()}):
+        if compact:
+            _, seconds = timed(degrees.load_data, directory, True)
+            report["load_seconds"]["compact"] = seconds
+            _, report["memory_bytes"]["compact"] = traced_memory(graph.load_graph, directory)
+            _, seconds = timed(snapshot.compile_snapshot, directory, degrees.graph)
+            report["load_seconds"]["snapshot_compile"] = seconds
+            _, seconds = timed(snapshot.load_snapshot, directory)
+            report["load_seconds"]["snapshot"] = seconds
+            _, report["memory_bytes"]["snapshot"] = traced_memory(snapshot.load_snapshot, directory)
+            os.remove(snapshot.snapshot_path(directory))
+            person_ids = degrees.graph.person_ids
+            report["fuzzy_seconds"] = time_fuzzy(degrees.graph, random.Random(seed))
+            report["people"] = degrees.graph.num_people()
+            report["movies"] = degrees.graph.num_movies()
+            report["edges"] = degrees.graph.num_edges()
+        else:
+            clear_dict_data()
+            _, seconds = timed(degrees.load_data, directory)
+            report["load_seconds"]["dict"] = seconds
+            clear_dict_data()
+            _, report["memory_bytes"]["dict"] = traced_memory(degrees.load_data, directory)
+            person_ids = list(degrees.people)
+
+        pairs_rng = random.Random(seed)
+        pairs = [(pairs_rng.choice(person_ids), pairs_rng.choice(person_ids)) for _ in range(num_pairs)]
+        sample = [rng.choice(person_ids) for _ in range(min(1000, len(person_ids)))]
+        report["neighbors_seconds"]["compact" if compact else "dict"] = time_neighbors(sample)
+
+        for name, (strategy_compact, bidirectional) in strategies.items():
+            if strategy_compact != compact:
+                continue
+            expanded, seconds, lengths = run_pairs(pairs, bidirectional)
+            report["search"][name] = {
+                "pairs": num_pairs,
+                "seconds": seconds,
+                "expanded": expanded,
+                "connected": sum(length is not None for length in lengths),
+                "total_degrees": sum(length for length in lengths if length is not None),
+            }
+        clear_dict_data()
+
+    # Every strategy must agree on the answers
+    answers = {(r["connected"], r["total_degrees"]) for r in report["search"].values()}
+    report["consistent"] = len(answers) <= 1
+    return report
+
+
+def compare(args):
+    print("Loading data...")
+    degrees.load_data(args.directory, compact=True)
+    person_ids = degrees.graph.person_ids
+    rng = random.Random(args.seed)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(args.pairs)]
+    print(f"Searching {args.pairs} random pairs.")
+
+    results = {}
+    for name, bidirectional in (("bfs", False), ("bidirectional", True)):
+        results[name] = run_pairs(pairs, bidirectional)
+        expanded, seconds, _ = results[name]
+        print(f"  {name}: {expanded} people expanded, {seconds:.3f}s")
+
+    if results["bfs"][2] != results["bidirectional"][2]:
+        sys.exit("Path lengths differ between strategies.")
+    reduction = results["bfs"][0] / max(results["bidirectional"][0], 1)
+    print(f"Bidirectional search expanded {reduction:.1f}x fewer people.")
+
+
+def generate(args):
+    people, movies, edges = generate_dataset(args.directory, args.edges, args.seed)
+    print(f"Wrote {people} people, {movies} movies and {edges} stars to {args.directory}.")
+
+
+def run(args):
+    report = {
+        "version": REPORT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "datasets": [],
+    }
+    root = tempfile.mkdtemp(prefix="degrees-benchmark-")
+    try:
+        for size in args.sizes:
+            directory = os.path.join(root, str(size))
+            generate_dataset(directory, size, args.seed)
+            strategies = STRATEGIES
+            if size > DICT_EDGE_LIMIT and not args.all_strategies:
+                strategies = {name: s for name, s in STRATEGIES.items() if s[0]}
+            print(f"Benchmarking {size} edges...", file=sys.stderr)
+            result = benchmark_dataset(directory, args.pairs, args.seed, strategies)
+            result["size"] = size
+            report["datasets"].append(result)
+            shutil.rmtree(directory)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for degrees.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = commands.add_parser("compare", help="compare searches on a dataset")
+    compare_parser.add_argument("directory")
+    compare_parser.add_argument("--pairs", type=int, default=100)
+    compare_parser.add_argument("--seed", type=int, default=0)
+    compare_parser.set_defaults(function=compare)
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic dataset")
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--edges", type=int, required=True)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.set_defaults(function=generate)
+
+    run_parser = commands.add_parser("run", help="benchmark synthetic datasets")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5])
+    run_parser.add_argument("--pairs", type=int, default=50)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--all-strategies", action="store_true",
+                            help=f"also run the dict loader above {DICT_EDGE_LIMIT} edges")
+    run_parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    run_parser.set_defaults(function=run)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
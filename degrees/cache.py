@@ -0,0 +1,214 @@
+"""
+Caching for repeated degrees queries on a StarGraph.
+
+PathCache is a bounded LRU of shortest paths keyed by (source, target)
+person indices. A cached path also answers the reversed query.
+
+LandmarkIndex stores BFS distances from the K most connected people. Two
+people are in different components if a landmark reaches one but not the
+other, and |d(L, s) - d(L, t)| is a lower bound on their distance, so
+impossible or too distant pairs are rejected without searching.
+
+CachedSearch puts both in front of StarGraph's bidirectional search.
+"""
+
+import heapq
+from array import array
+from collections import OrderedDict
+
+
+class PathCache():
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, source, target):
+        """
+        Returns (True, path) if the pair or its reverse is cached,
+        else (False, None). A cached path of None means not connected.
+        """
+        key = (source, target)
+        if key in self.paths:
+            self.paths.move_to_end(key)
+            self.hits += 1
+            return True, self.paths[key]
+        if (target, source) in self.paths:
+            self.paths.move_to_end((target, source))
+            self.hits += 1
+            return True, reverse_path(target, self.paths[(target, source)])
+        self.misses += 1
+        return False, None
+
+    def put(self, source, target, path):
+        self.paths[(source, target)] = path
+        self.paths.move_to_end((source, target))
+        while len(self.paths) > self.maxsize:
+            self.paths.popitem(last=False)
+
+    def stats(self):
+        return {
+            "size": len(self.paths),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def reverse_path(source, path):
+    """
+    Returns the (movie, person) path from the end of path back to source.
+    """
+    if path is None:
+        return None
+    people = [source] + [person for _, person in path]
+    reversed_path = []
+    for i in range(len(path) - 1, -1, -1):
+        reversed_path.append((path[i][0], people[i]))
+    return reversed_path
+
+
+class LandmarkIndex():
+    def __init__(self, graph, k=16):
+        self.graph = graph
+        self.landmarks = most_connected(graph, k)
+        self.distances = [bfs_distances(graph, landmark) for landmark in self.landmarks]
+
+    def disconnected(self, source, target):
+        """
+        Returns True if some landmark proves source and target
+        are in different components.
+        """
+        for distance in self.distances:
+            if (distance[source] == -1) != (distance[target] == -1):
+                return True
+        return False
+
+    def lower_bound(self, source, target):
+        """
+        Returns a lower bound on the degrees between source and target.
+        """
+        bound = 0
+        for distance in self.distances:
+            ds, dt = distance[source], distance[target]
+            if ds != -1 and dt != -1:
+                bound = max(bound, abs(ds - dt))
+        return bound
+
+    def upper_bound(self, source, target):
+        """
+        Returns an upper bound on the degrees between source and target,
+        or None if no landmark reaches both.
+        """
+        bound = None
+        for distance in self.distances:
+            ds, dt = distance[source], distance[target]
+            if ds != -1 and dt != -1 and (bound is None or ds + dt < bound):
+                bound = ds + dt
+        return bound
+
+
+def most_connected(graph, k):
+    """
+    Returns the k person indices with the most co-star appearances.
+    """
+    def connections(person):
+        return sum(len(graph.stars_of(movie)) for movie in graph.movies_of(person))
+    return heapq.nlargest(k, range(graph.num_people()), key=connections)
+
+
+def bfs_distances(graph, source):
+    """
+    Returns an array of the degrees from source to every person index,
+    -1 where unreachable.
+    """
+    distance = array("i", [-1]) * graph.num_people()
+    movie_seen = bytearray(graph.num_movies())
+    distance[source] = 0
+    layer = [source]
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = []
+        for person in layer:
+            for movie in graph.movies_of(person):
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for star in graph.stars_of(movie):
+                    if distance[star] == -1:
+                        distance[star] = depth
+                        next_layer.append(star)
+        layer = next_layer
+    return distance
+
+
+class CachedSearch():
+    def __init__(self, graph, maxsize=10000, landmarks=0):
+        self.graph = graph
+        self.cache = PathCache(maxsize)
+        self.landmarks = LandmarkIndex(graph, landmarks) if landmarks else None
+        self.rejected = 0
+
+    def lookup(self, source, target, max_degrees=None):
+        """
+        Answers a query from the cache or the landmarks alone.
+        Returns (True, path) if answered, else (False, None).
+        """
+        found, path = self.cache.get(source, target)
+        if found:
+            if max_degrees is not None and path is not None and len(path) > max_degrees:
+                return True, None
+            return True, path
+
+        if self.landmarks is not None:
+            if self.landmarks.disconnected(source, target):
+                self.rejected += 1
+                self.cache.put(source, target, None)
+                return True, None
+            if max_degrees is not None and self.landmarks.lower_bound(source, target) > max_degrees:
+                self.rejected += 1
+                return True, None
+        return False, None
+
+    def remember(self, source, target, path, max_degrees=None):
+        """
+        Caches a searched path and returns it, limited to max_degrees.
+        """
+        self.cache.put(source, target, path)
+        if max_degrees is not None and path is not None and len(path) > max_degrees:
+            return None
+        return path
+
+    def shortest_index_path(self, source, target, max_degrees=None):
+        """
+        Returns the shortest (movie index, person index) path, or None if
+        the pair is not connected or provably further than max_degrees apart.
+        """
+        found, path = self.lookup(source, target, max_degrees)
+        if found:
+            return path
+        path = self.graph.bidirectional_index_path(source, target)
+        return self.remember(source, target, path, max_degrees)
+
+    def shortest_path(self, source, target, max_degrees=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target, using IMDb ids.
+        """
+        path = self.shortest_index_path(
+            self.graph.person_index[source], self.graph.person_index[target], max_degrees
+        )
+        if path is None:
+            return None
+        return self.graph.path_to_ids(path)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["landmarks"] = len(self.landmarks.landmarks) if self.landmarks else 0
+        stats["rejected"] = self.rejected
+        return stats
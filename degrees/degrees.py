@@ -1,7 +1,8 @@
-import csv
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import print_progress, read_rows
+from snapshot import open_graph
+from util import Node, StackFrontier, QueueFrontier, ExploredSet
 
 # Maps names to a set of corresponding person_ids
 #Eg. "Kevin Bacon":102
@@ -13,54 +14,76 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed StarGraph, used instead of the dicts above
+# when loading with compact=True
+graph = None
 
-def load_data(directory):
+
+def load_data(directory, compact=False, progress=None):
     """
     Load data from CSV files into memory.
+    Returns the number of star rows dropped for naming an unknown
+    person or movie. Rows are streamed by graph.read_rows, which calls
+    progress as they are read.
     """
+    global graph
+    if compact:
+        graph = open_graph(directory, progress)
+        return (graph.load_stats.get("dropped_unknown_person", 0)
+                + graph.load_stats.get("dropped_unknown_movie", 0))
+    graph = None
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    for person_id, name, birth in read_rows(f"{directory}/people.csv", ("id", "name", "birth"),
+                                            progress, "people"):
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set()
+        }
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    for movie_id, title, year in read_rows(f"{directory}/movies.csv", ("id", "title", "year"),
+                                           progress, "movies"):
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+            "stars": set()
+        }
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    dropped = 0
+    for person_id, movie_id in read_rows(f"{directory}/stars.csv", ("person_id", "movie_id"),
+                                         progress, "stars"):
+        if person_id not in people or movie_id not in movies:
+            dropped += 1
+            continue
+        people[person_id]["movies"].add(movie_id)
+        movies[movie_id]["stars"].add(person_id)
+    return dropped
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    compact = "--compact" in args
+    if compact:
+        args.remove("--compact")
+    bidirectional = "--bidirectional" in args
+    if bidirectional:
+        args.remove("--bidirectional")
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--compact] [--bidirectional] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    dropped = load_data(directory, compact, print_progress)
+    if dropped:
+        print(f"Dropped {dropped} stars rows naming an unknown person or movie.")
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -70,7 +93,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -79,21 +102,29 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_for_id(path[i][1])["name"]
+            person2 = person_for_id(path[i + 1][1])["name"]
+            movie = movie_for_id(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    With bidirectional=True the search grows from both ends instead.
+    If a stats dictionary is given, stats["expanded"] counts expanded people.
     """
+    if graph is not None:
+        return graph.shortest_path(source, target, bidirectional, stats)
+    if bidirectional:
+        return bidirectional_shortest_path(source, target, stats)
+
     #Person Ids of states explored
-    explored = []
+    explored = ExploredSet()
 
     start = Node(state=source,parent=None,action=None)
     frontier = QueueFrontier()
@@ -110,7 +141,9 @@ def shortest_path(source, target):
             return backtrack(node)
 
         else:
-            explored.append(node.state)
+            explored.add(node.state)
+            if stats is not None:
+                stats["expanded"] = stats.get("expanded", 0) + 1
             for movie_id,person_id in neighbors_for_person(node.state):
                 if not (frontier.contains_state(person_id)) and person_id not in explored:
 
@@ -120,6 +153,76 @@ def shortest_path(source, target):
                     else:
                         frontier.add(child)
 
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Breadth first search from both source and target, always expanding
+    the smaller frontier by one full layer, until the two meet.
+    Returns the same (movie_id, person_id) path as shortest_path.
+    """
+    if source == target:
+        return []
+
+    # Maps person_id -> (movie_id, person_id one step closer to that side's root, depth)
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_layer, meeting = expand_layer(forward_layer, forward, backward, stats)
+        else:
+            backward_layer, meeting = expand_layer(backward_layer, backward, forward, stats)
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+    return None
+
+
+def expand_layer(layer, parents, other_parents, stats=None):
+    """
+    Expands every person of a BFS layer, recording parents.
+    Returns the next layer and the person where the search met the other
+    side on the shortest total path, or None if they did not meet.
+    """
+    next_layer = []
+    meeting = None
+    for person_id in layer:
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + 1
+        depth = parents[person_id][2] + 1
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id, depth)
+            next_layer.append(neighbor_id)
+            if neighbor_id in other_parents:
+                if meeting is None or other_parents[neighbor_id][2] < other_parents[meeting][2]:
+                    meeting = neighbor_id
+    return next_layer, meeting
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Returns the (movie_id, person_id) path from the forward root to the
+    backward root through the meeting person.
+    """
+    path = []
+    person_id = meeting
+    while forward[person_id][1] is not None:
+        movie_id, parent_id, _ = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    person_id = meeting
+    while backward[person_id][1] is not None:
+        movie_id, parent_id, _ = backward[person_id]
+        path.append((movie_id, parent_id))
+        person_id = parent_id
+    return path
+
+
 def backtrack(node:Node):
     """
     Returns list of (movie_id,person_id) that a node traces back
@@ -130,7 +233,6 @@ def backtrack(node:Node):
         pathTaken.append(pairToAdd)
         node = node.parent
     pathTaken.reverse()
-    print(pathTaken)
     return pathTaken
     
 
@@ -139,13 +241,16 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    if graph is not None:
+        person_ids = graph.person_ids_for_name(name)
+    else:
+        person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_for_id(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -160,11 +265,32 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_for_id(person_id):
+    """
+    Returns a dictionary with at least the name and birth of a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_for_id(movie_id):
+    """
+    Returns a dictionary with at least the title and year of a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,455 @@
+"""
+Compact, integer-indexed version of the degrees star graph.
+
+`load_data` in degrees.py keeps a dict of dicts per person and per movie,
+each holding a Python set of string ids. That is fine for `small` but costs
+gigabytes on `large`. Here every person and movie id is interned to a dense
+integer and the bipartite person <-> movie graph is stored CSR style: an
+offsets array plus one flat index array per direction, all `array("i")`.
+Ids, names and other metadata are kept in the string tables of tables.py
+rather than as Python strings, lists and dicts.
+"""
+
+import csv
+import operator
+import os
+import sys
+import time
+from array import array
+
+from tables import KeyIndex, NameTable, StringTable
+
+
+# Rows between progress reports while loading
+PROGRESS_ROWS = 100000
+
+
+class StarGraph():
+    def __init__(self):
+        # Index -> IMDb id / metadata, and IMDb id -> index
+        self.person_ids = StringTable()
+        self.person_names = StringTable()
+        self.person_births = StringTable()
+        self.person_index = KeyIndex(self.person_ids)
+
+        self.movie_ids = StringTable()
+        self.movie_titles = StringTable()
+        self.movie_years = StringTable()
+        self.movie_index = KeyIndex(self.movie_ids)
+
+        # Maps lowercase names to person indices
+        self.names = NameTable()
+
+        # CSR adjacency: the movies of person p are
+        # person_movies[person_offsets[p]:person_offsets[p + 1]]
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_stars = array("i")
+
+        # Memory map backing the arrays when loaded from a snapshot
+        self.snapshot = None
+
+        # Row and dropped edge counts from load_graph
+        self.load_stats = {}
+
+    def num_people(self):
+        return len(self.person_ids)
+
+    def num_movies(self):
+        return len(self.movie_ids)
+
+    def num_edges(self):
+        return len(self.person_movies)
+
+    def add_person(self, person_id, name, birth):
+        data = person_id.encode("utf-8")
+        index = self.person_ids.append(data)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.person_index.add(index, data)
+        self.names.add(name.lower(), index)
+        return index
+
+    def add_movie(self, movie_id, title, year):
+        data = movie_id.encode("utf-8")
+        index = self.movie_ids.append(data)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        self.movie_index.add(index, data)
+        return index
+
+    def build_edges(self, edge_people, edge_movies):
+        """
+        Build both CSR directions from parallel arrays of
+        (person index, movie index) star edges. Duplicate edges are dropped.
+        """
+        num_people = self.num_people()
+        num_movies = self.num_movies()
+
+        # Counting sort of the edges by person
+        offsets = array("i", [0]) * (num_people + 1)
+        for p in edge_people:
+            offsets[p + 1] += 1
+        for p in range(num_people):
+            offsets[p + 1] += offsets[p]
+        filled = array("i", offsets)
+        person_movies = array("i", [0]) * len(edge_people)
+        for p, m in zip(edge_people, edge_movies):
+            person_movies[filled[p]] = m
+            filled[p] += 1
+        del filled
+
+        # Sort and dedupe each person's movie list in place
+        write = 0
+        compact_offsets = array("i", [0]) * (num_people + 1)
+        for p in range(num_people):
+            start, end = offsets[p], offsets[p + 1]
+            for m in sorted(set(person_movies[start:end])):
+                person_movies[write] = m
+                write += 1
+            compact_offsets[p + 1] = write
+        del person_movies[write:]
+        self.person_offsets = compact_offsets
+        self.person_movies = person_movies
+
+        # Transpose into movie -> stars, ordered by person index
+        movie_offsets = array("i", [0]) * (num_movies + 1)
+        for m in person_movies:
+            movie_offsets[m + 1] += 1
+        for m in range(num_movies):
+            movie_offsets[m + 1] += movie_offsets[m]
+        filled = array("i", movie_offsets)
+        movie_stars = array("i", [0]) * len(person_movies)
+        for p in range(num_people):
+            for k in range(compact_offsets[p], compact_offsets[p + 1]):
+                m = person_movies[k]
+                movie_stars[filled[m]] = p
+                filled[m] += 1
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+    def movies_of(self, person):
+        """
+        Returns the movie indices a person index starred in.
+        """
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indices that starred in a movie index.
+        """
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def degree(self, person):
+        """
+        Returns the number of movies a person index starred in.
+        """
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def neighbors(self, person):
+        """
+        Yields (movie index, person index) pairs for a person index.
+        """
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        movie_ids = self.movie_ids
+        person_ids = self.person_ids
+        return {
+            (movie_ids[movie], person_ids[star])
+            for movie, star in self.neighbors(self.person_index[person_id])
+        }
+
+    def path_to_ids(self, path):
+        """
+        Converts a list of (movie index, person index) pairs to IMDb ids.
+        """
+        return [(self.movie_ids[m], self.person_ids[p]) for m, p in path]
+
+    def shortest_path(self, source, target, bidirectional=False, stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.
+        """
+        search = self.bidirectional_index_path if bidirectional else self.shortest_index_path
+        path = search(self.person_index[source], self.person_index[target], stats)
+        if path is None:
+            return None
+        return self.path_to_ids(path)
+
+    def shortest_index_path(self, source, target, stats=None):
+        """
+        Breadth first search over person indices. Each movie is expanded
+        at most once, since every star of it is reached at the same depth.
+        Returns a list of (movie index, person index) pairs or None.
+        """
+        if source == target:
+            return []
+
+        parent_person = array("i", [-1]) * self.num_people()
+        parent_movie = array("i", [-1]) * self.num_people()
+        movie_seen = bytearray(self.num_movies())
+        parent_person[source] = source
+
+        layer = [source]
+        while layer:
+            next_layer = []
+            for person in layer:
+                if stats is not None:
+                    stats["expanded"] = stats.get("expanded", 0) + 1
+                for movie in self.movies_of(person):
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+                    for star in self.stars_of(movie):
+                        if parent_person[star] != -1:
+                            continue
+                        parent_person[star] = person
+                        parent_movie[star] = movie
+                        if star == target:
+                            return self.backtrack(parent_person, parent_movie, source, target)
+                        next_layer.append(star)
+            layer = next_layer
+        return None
+
+    def shortest_index_paths(self, source, targets):
+        """
+        Grows a single breadth first search tree from source until every
+        target is reached. Returns a dictionary mapping each reachable target
+        to its list of (movie index, person index) pairs.
+        """
+        paths = {}
+        remaining = set(targets)
+        if source in remaining:
+            paths[source] = []
+            remaining.discard(source)
+        if not remaining:
+            return paths
+
+        parent_person = array("i", [-1]) * self.num_people()
+        parent_movie = array("i", [-1]) * self.num_people()
+        movie_seen = bytearray(self.num_movies())
+        parent_person[source] = source
+
+        layer = [source]
+        while layer and remaining:
+            next_layer = []
+            for person in layer:
+                for movie in self.movies_of(person):
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+                    for star in self.stars_of(movie):
+                        if parent_person[star] != -1:
+                            continue
+                        parent_person[star] = person
+                        parent_movie[star] = movie
+                        next_layer.append(star)
+                        if star in remaining:
+                            remaining.discard(star)
+                            paths[star] = self.backtrack(parent_person, parent_movie, source, star)
+            layer = next_layer
+        return paths
+
+    def bidirectional_index_path(self, source, target, stats=None):
+        """
+        Breadth first search from both ends, expanding the smaller frontier
+        one full layer at a time until the two sides meet.
+        Returns a list of (movie index, person index) pairs or None.
+        """
+        if source == target:
+            return []
+
+        forward = _SearchSide(self, source)
+        backward = _SearchSide(self, target)
+        while forward.layer and backward.layer:
+            if len(forward.layer) <= len(backward.layer):
+                meeting = forward.expand(backward, stats)
+            else:
+                meeting = backward.expand(forward, stats)
+            if meeting is not None:
+                path = self.backtrack(forward.parent_person, forward.parent_movie, source, meeting)
+                person = meeting
+                while person != target:
+                    movie = backward.parent_movie[person]
+                    person = backward.parent_person[person]
+                    path.append((movie, person))
+                return path
+        return None
+
+    def backtrack(self, parent_person, parent_movie, source, target):
+        """
+        Returns list of (movie index, person index) from source to target
+        """
+        path = []
+        person = target
+        while person != source:
+            path.append((parent_movie[person], person))
+            person = parent_person[person]
+        path.reverse()
+        return path
+
+    def person_ids_for_name(self, name):
+        """
+        Returns the IMDb ids of every person with the given name.
+        """
+        return [self.person_ids[p] for p in self.names.get(name.lower(), [])]
+
+    def person(self, person_id):
+        """
+        Returns a dictionary of name and birth for a person id.
+        """
+        p = self.person_index[person_id]
+        return {"name": self.person_names[p], "birth": self.person_births[p]}
+
+    def movie(self, movie_id):
+        """
+        Returns a dictionary of title and year for a movie id.
+        """
+        m = self.movie_index[movie_id]
+        return {"title": self.movie_titles[m], "year": self.movie_years[m]}
+
+
+class _SearchSide():
+    """
+    One direction of a bidirectional breadth first search on a StarGraph.
+    """
+    def __init__(self, graph, root):
+        self.graph = graph
+        self.parent_person = array("i", [-1]) * graph.num_people()
+        self.parent_movie = array("i", [-1]) * graph.num_people()
+        self.depth = array("i", [-1]) * graph.num_people()
+        self.movie_seen = bytearray(graph.num_movies())
+        self.parent_person[root] = root
+        self.depth[root] = 0
+        self.layer = [root]
+
+    def expand(self, other, stats=None):
+        """
+        Expands the current layer. Returns the person on the shortest
+        path through both sides if they met, else None.
+        """
+        graph = self.graph
+        movie_seen = self.movie_seen
+        if stats is not None:
+            stats["expanded"] = stats.get("expanded", 0) + len(self.layer)
+        next_layer = []
+        meeting = None
+        for person in self.layer:
+            depth = self.depth[person] + 1
+            for movie in graph.movies_of(person):
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for star in graph.stars_of(movie):
+                    if self.parent_person[star] != -1:
+                        continue
+                    self.parent_person[star] = person
+                    self.parent_movie[star] = movie
+                    self.depth[star] = depth
+                    next_layer.append(star)
+                    if other.depth[star] != -1:
+                        if meeting is None or other.depth[star] < other.depth[meeting]:
+                            meeting = star
+        self.layer = next_layer
+        return meeting
+
+
+def read_rows(path, columns, progress=None, stage=None):
+    """
+    Streams the given columns of a CSV file as tuples, without building a
+    dictionary per row. Calls progress(stage, rows, fraction, rows_per_second)
+    every PROGRESS_ROWS rows and once at the end.
+    """
+    total_bytes = os.path.getsize(path)
+    start = time.perf_counter()
+    rows = 0
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        indices = [header.index(column) for column in columns]
+        getter = operator.itemgetter(*indices)
+        for row in reader:
+            if not row:
+                continue
+            rows += 1
+            yield getter(row)
+            if progress is not None and rows % PROGRESS_ROWS == 0:
+                # The underlying buffer position is only approximate,
+                # since the text layer reads ahead in chunks
+                fraction = min(f.buffer.tell() / total_bytes, 1.0) if total_bytes else 1.0
+                progress(stage, rows, fraction, rows / (time.perf_counter() - start))
+    if progress is not None:
+        elapsed = time.perf_counter() - start
+        progress(stage, rows, 1.0, rows / elapsed if elapsed else 0.0)
+
+
+def print_progress(stage, rows, fraction, rows_per_second):
+    """
+    Progress callback for load_graph that reports on stderr.
+    """
+    end = "\n" if fraction >= 1.0 else ""
+    print(f"\r{stage}: {rows} rows ({fraction:.0%}, {rows_per_second:,.0f} rows/s)",
+          end=end, file=sys.stderr, flush=True)
+
+
+def load_graph(directory, progress=None):
+    """
+    Load the CSV files of a degrees dataset into a StarGraph.
+
+    Rows are streamed as tuples and star edges are collected into two
+    int arrays, so peak memory beyond the graph itself stays at a few bytes
+    per edge. Star rows naming an unknown person or movie are dropped and
+    counted in graph.load_stats.
+    """
+    graph = StarGraph()
+    start = time.perf_counter()
+
+    people = read_rows(f"{directory}/people.csv", ("id", "name", "birth"), progress, "people")
+    for person_id, name, birth in people:
+        graph.add_person(person_id, name, birth)
+
+    movies = read_rows(f"{directory}/movies.csv", ("id", "title", "year"), progress, "movies")
+    for movie_id, title, year in movies:
+        graph.add_movie(movie_id, title, year)
+
+    edge_people = array("i")
+    edge_movies = array("i")
+    unknown_people = 0
+    unknown_movies = 0
+    person_position = graph.person_index.position
+    movie_position = graph.movie_index.position
+    stars = read_rows(f"{directory}/stars.csv", ("person_id", "movie_id"), progress, "stars")
+    for person_id, movie_id in stars:
+        person = person_position(person_id.encode("utf-8"))
+        movie = movie_position(movie_id.encode("utf-8"))
+        if person < 0:
+            unknown_people += 1
+        elif movie < 0:
+            unknown_movies += 1
+        else:
+            edge_people.append(person)
+            edge_movies.append(movie)
+
+    star_rows = len(edge_people) + unknown_people + unknown_movies
+    graph.build_edges(edge_people, edge_movies)
+    graph.load_stats = {
+        "people": graph.num_people(),
+        "movies": graph.num_movies(),
+        "star_rows": star_rows,
+        "edges": graph.num_edges(),
+        "dropped_unknown_person": unknown_people,
+        "dropped_unknown_movie": unknown_movies,
+        "dropped_duplicate": star_rows - unknown_people - unknown_movies - graph.num_edges(),
+        "seconds": time.perf_counter() - start,
+    }
+    return graph
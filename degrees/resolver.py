@@ -0,0 +1,145 @@
+"""
+Non-interactive name resolution for a StarGraph.
+
+`person_id_for_name` in degrees.py only matches exact lowercase names and
+asks on stdin when a name is ambiguous. NameIndex is built once after
+loading and answers exact, prefix and fuzzy (trigram) lookups, returning
+ranked candidates with their birth years instead of prompting.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nlargest
+from math import ceil
+
+# Trigrams shared by more names than this are not counted when gathering
+# fuzzy candidates, as far as the required overlap allows
+MAX_POSTINGS = 5000
+
+# Fuzzy lookups score at most this many keys, those sharing the most
+# trigrams with the query
+MAX_CANDIDATES = 1000
+
+
+def trigrams(text):
+    """
+    Returns the set of trigrams of a lowercase string, padded so that
+    the start and end of the string count as well.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    def __init__(self, graph):
+        self.graph = graph
+        # Distinct lowercase names, sorted for prefix search
+        self.keys = sorted(graph.names)
+        # Trigram -> ids of the keys containing it
+        self.postings = {}
+        # Trigram ids of key k are key_trigrams[key_offsets[k]:key_offsets[k + 1]],
+        # so fuzzy scoring never recomputes a key's trigrams
+        self.trigram_ids = {}
+        self.key_offsets = array("i", [0])
+        self.key_trigrams = array("i")
+        for key_id, key in enumerate(self.keys):
+            for trigram in trigrams(key):
+                postings = self.postings.get(trigram)
+                if postings is None:
+                    postings = self.postings[trigram] = array("i")
+                    self.trigram_ids[trigram] = len(self.trigram_ids)
+                postings.append(key_id)
+                self.key_trigrams.append(self.trigram_ids[trigram])
+            self.key_offsets.append(len(self.key_trigrams))
+
+    def candidates(self, key, score):
+        """
+        Returns candidate records for every person with a lowercase name.
+        """
+        graph = self.graph
+        return [
+            {
+                "id": graph.person_ids[p],
+                "name": graph.person_names[p],
+                "birth": graph.person_births[p],
+                "score": score,
+            }
+            for p in graph.names.get(key, [])
+        ]
+
+    def exact(self, name):
+        return self.candidates(name.strip().lower(), 1.0)
+
+    def prefix(self, name, limit=10):
+        """
+        Returns up to limit candidates whose name starts with name,
+        in alphabetical order.
+        """
+        query = name.strip().lower()
+        results = []
+        i = bisect_left(self.keys, query)
+        while i < len(self.keys) and self.keys[i].startswith(query) and len(results) < limit:
+            results.extend(self.candidates(self.keys[i], len(query) / len(self.keys[i])))
+            i += 1
+        return results[:limit]
+
+    def fuzzy(self, name, limit=10, min_score=0.3):
+        """
+        Returns up to limit candidates ranked by trigram similarity to name.
+        Only keys sharing enough trigrams with name to reach min_score are
+        scored, and of those at most MAX_CANDIDATES, so a very short name
+        may miss some weak matches.
+        """
+        query = name.strip().lower()
+        query_trigrams = trigrams(query)
+        postings = sorted((self.postings[t] for t in query_trigrams if t in self.postings), key=len)
+        # score = common / (query + key - common) <= common / query, so a key
+        # reaching min_score shares at least `needed` trigrams with the query
+        needed = max(1, ceil(min_score * len(query_trigrams) - 1e-9))
+        if len(postings) < needed:
+            return []
+        # Such a key is still in needed - skipped of the lists left after
+        # skipping the longest ones, so up to needed - 1 can go uncounted
+        skipped = min(needed - 1, sum(len(p) > MAX_POSTINGS for p in postings))
+        counts = Counter()
+        for posting in postings[:len(postings) - skipped]:
+            counts.update(posting)
+        threshold = needed - skipped
+        shared = [key_id for key_id, count in counts.items() if count >= threshold]
+        if len(shared) > MAX_CANDIDATES:
+            shared = nlargest(MAX_CANDIDATES, shared, key=counts.__getitem__)
+
+        query_ids = {self.trigram_ids[t] for t in query_trigrams if t in self.trigram_ids}
+        key_offsets, key_trigrams = self.key_offsets, self.key_trigrams
+        scored = []
+        for key_id in shared:
+            start, end = key_offsets[key_id], key_offsets[key_id + 1]
+            common = len(query_ids.intersection(key_trigrams[start:end]))
+            score = common / (len(query_trigrams) + end - start - common)
+            if score >= min_score:
+                scored.append((-score, self.keys[key_id]))
+        scored.sort()
+
+        results = []
+        for negative_score, key in scored:
+            results.extend(self.candidates(key, -negative_score))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def resolve(self, name, limit=10):
+        """
+        Returns ranked candidates for a name: exact matches first, then
+        prefix matches, then fuzzy matches, without duplicates.
+        """
+        results = []
+        seen = set()
+        for matches in (self.exact(name), self.prefix(name, limit), self.fuzzy(name, limit)):
+            for candidate in matches:
+                if candidate["id"] not in seen:
+                    seen.add(candidate["id"])
+                    results.append(candidate)
+            if len(results) >= limit:
+                break
+        return results[:limit]
@@ -0,0 +1,255 @@
+"""
+Long-running HTTP service answering degrees queries from a warm graph.
+
+The dataset is loaded once. Requests are handled concurrently on an asyncio
+loop; cache and landmark lookups run inline, and searches that miss them
+run on a pool of worker processes forked after loading, which share the
+graph copy-on-write.
+
+Endpoints (GET, JSON responses):
+    /path?source=...&target=...[&max_degrees=N]   names or IMDb ids
+    /resolve?name=...[&limit=N]                   ranked name candidates
+    /metrics                                      graph size, cache, latency
+
+Usage: python service.py directory [--host HOST] [--port PORT] [--workers N]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from cache import CachedSearch
+from resolver import NameIndex
+from snapshot import open_graph
+
+# Graph shared with forked search workers
+graph = None
+
+# Number of recent request latencies kept for percentiles
+LATENCY_WINDOW = 10000
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+}
+
+
+def search(source, target):
+    """
+    Runs a bidirectional search on the shared graph in a worker process.
+    """
+    return graph.bidirectional_index_path(source, target)
+
+
+def _set_result(future, value):
+    # A request cancelled while its search ran has nobody to answer
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
+def percentile(values, fraction):
+    """
+    Returns the value at a fraction of the way through sorted values.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, int(fraction * len(values)))
+    return values[index]
+
+
+class DegreesService():
+    def __init__(self, star_graph, workers=None, cache_size=10000, landmarks=0):
+        global graph
+        graph = star_graph
+        self.graph = star_graph
+        self.search = CachedSearch(star_graph, cache_size, landmarks)
+        self.names = NameIndex(star_graph)
+        # Workers fork here, so create the service before starting an event loop
+        self.pool = multiprocessing.get_context("fork").Pool(workers)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.close()
+        self.pool.join()
+
+    async def handle(self, reader, writer):
+        start = time.perf_counter()
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                status, body = 400, {"error": "Malformed request"}
+            elif parts[0] != "GET":
+                status, body = 405, {"error": "Only GET is supported"}
+            else:
+                status, body = await self.route(parts[1])
+        except Exception as e:
+            status, body = 400, {"error": str(e)}
+
+        payload = json.dumps(body).encode("utf-8")
+        try:
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            # The client went away (reset or broken pipe) before the response was sent
+            return
+        finally:
+            writer.close()
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - start)
+
+    async def route(self, target):
+        url = urlsplit(target)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == "/path":
+            return await self.find_path(query)
+        if url.path == "/resolve":
+            if "name" not in query:
+                return 400, {"error": "Missing name"}
+            return 200, {"candidates": self.names.resolve(query["name"], int(query.get("limit", 10)))}
+        if url.path == "/metrics":
+            return 200, self.metrics()
+        return 404, {"error": f"Unknown path {url.path}"}
+
+    def resolve(self, value):
+        """
+        Returns (person index, error response) for a name or IMDb id.
+        """
+        if value in self.graph.person_index:
+            return self.graph.person_index[value], None
+        matches = self.graph.names.get(value.lower(), [])
+        if len(matches) == 1:
+            return matches[0], None
+        candidates = self.names.resolve(value, limit=10)
+        if len(matches) == 0:
+            return None, (404, {"error": f"Person not found: {value}", "candidates": candidates})
+        return None, (409, {"error": f"Ambiguous name: {value}", "candidates": candidates})
+
+    async def run_search(self, source, target):
+        """
+        Runs a search on the worker pool without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pool.apply_async(
+            search, (source, target),
+            callback=lambda path: loop.call_soon_threadsafe(_set_result, future, path),
+            error_callback=lambda e: loop.call_soon_threadsafe(_set_exception, future, e),
+        )
+        return await future
+
+    async def find_path(self, query):
+        if "source" not in query or "target" not in query:
+            return 400, {"error": "Missing source or target"}
+        source, error = self.resolve(query["source"])
+        if error:
+            return error
+        target, error = self.resolve(query["target"])
+        if error:
+            return error
+        max_degrees = int(query["max_degrees"]) if "max_degrees" in query else None
+
+        found, path = self.search.lookup(source, target, max_degrees)
+        if not found:
+            path = await self.run_search(source, target)
+            path = self.search.remember(source, target, path, max_degrees)
+
+        graph = self.graph
+        body = {"source": graph.person_ids[source], "target": graph.person_ids[target]}
+        if path is None:
+            body["degrees"] = None
+            body["path"] = None
+        else:
+            body["degrees"] = len(path)
+            body["path"] = [
+                {
+                    "movie": graph.movie_titles[movie],
+                    "movie_id": graph.movie_ids[movie],
+                    "person": graph.person_names[person],
+                    "person_id": graph.person_ids[person],
+                }
+                for movie, person in path
+            ]
+        return 200, body
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        return {
+            "graph": {
+                "people": self.graph.num_people(),
+                "movies": self.graph.num_movies(),
+                "edges": self.graph.num_edges(),
+            },
+            "cache": self.search.stats(),
+            "requests": self.requests,
+            "latency_seconds": {
+                "p50": percentile(latencies, 0.50),
+                "p90": percentile(latencies, 0.90),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1] if latencies else None,
+            },
+        }
+
+
+async def serve(service, args):
+    server = await service.start(args.host, args.port)
+    print(f"Serving on http://{args.host}:{service.port()}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Degrees of separation query service.")
+    parser.add_argument("directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--landmarks", type=int, default=16)
+    args = parser.parse_args()
+    print("Loading data...", file=sys.stderr)
+    # Built before asyncio.run, so the pool forks before the loop exists
+    service = DegreesService(open_graph(args.directory), args.workers, args.cache_size, args.landmarks)
+    try:
+        asyncio.run(serve(service, args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,23 @@
+import os
+import shutil
+import tempfile
+import asyncio
+import json
+import random
+import sys
 import unittest
+from unittest import mock
 
-from degrees import shortest_path, load_data, names
+import degrees
+import batch
+import benchmark
+import cache
+import resolver
+import service
+import snapshot
+from degrees import shortest_path, load_data, names, neighbors_for_person
+from graph import StarGraph, load_graph
+from util import Node, StackFrontier, QueueFrontier, ExploredSet
 
 class TestShortestPath(unittest.TestCase):
 
@@ -23,5 +40,403 @@ class TestShortestPath(unittest.TestCase):
         result = shortest_path("193", "193")
         self.assertEqual(result, [])
 
+    def test_bidirectional_matches_bfs(self):
+        self.assertEqual(shortest_path("193", "158", bidirectional=True),
+                         [('104257','102'), ('112384','158')])
+        self.assertIsNone(shortest_path("914612", "102", bidirectional=True))
+        self.assertEqual(shortest_path("193", "193", bidirectional=True), [])
+        for source in degrees.people:
+            for target in degrees.people:
+                expected = shortest_path(source, target)
+                result = shortest_path(source, target, bidirectional=True)
+                if expected is None:
+                    self.assertIsNone(result)
+                else:
+                    self.assertEqual(len(result), len(expected))
+                    if result:
+                        self.assertEqual(result[-1][1], target)
+
+
+class TestFrontiers(unittest.TestCase):
+
+    def test_queue_frontier_is_fifo(self):
+        frontier = QueueFrontier()
+        for state in ["a", "b", "c"]:
+            frontier.add(Node(state, None, None))
+        self.assertTrue(frontier.contains_state("b"))
+        self.assertEqual([frontier.remove().state for _ in range(3)], ["a", "b", "c"])
+        self.assertFalse(frontier.contains_state("b"))
+        self.assertTrue(frontier.empty())
+        with self.assertRaises(Exception):
+            frontier.remove()
+
+    def test_stack_frontier_is_lifo_and_counts_duplicates(self):
+        frontier = StackFrontier()
+        frontier.add(Node("a", None, None))
+        frontier.add(Node("a", None, None))
+        frontier.add(Node("b", None, None))
+        self.assertEqual(frontier.remove().state, "b")
+        self.assertEqual(frontier.remove().state, "a")
+        self.assertTrue(frontier.contains_state("a"))
+        frontier.remove()
+        self.assertFalse(frontier.contains_state("a"))
+
+    def test_explored_trackers(self):
+        explored = ExploredSet()
+        explored.add("102")
+        self.assertIn("102", explored)
+        self.assertNotIn("129", explored)
+
+
+class TestCompactGraph(unittest.TestCase):
+
+    def setUp(self):
+        load_data("small")
+        self.expected_neighbors = {
+            person_id: neighbors_for_person(person_id) for person_id in degrees.people
+        }
+        load_data("small", compact=True)
+
+    def tearDown(self):
+        load_data("small")
+
+    def test_neighbors_match_dict_loader(self):
+        for person_id, expected in self.expected_neighbors.items():
+            self.assertEqual(neighbors_for_person(person_id), expected)
+
+    def test_source_connected_to_target(self):
+        result = shortest_path("193", "158")
+        self.assertEqual(result, [('104257','102'), ('112384','158')])
+
+    def test_no_connection_returns_None(self):
+        self.assertIsNone(shortest_path("914612", "102"))
+
+    def test_source_and_target_are_the_same(self):
+        self.assertEqual(shortest_path("193", "193"), [])
+
+    def test_bidirectional_matches_bfs(self):
+        for source in degrees.graph.person_ids:
+            for target in degrees.graph.person_ids:
+                expected = shortest_path(source, target)
+                result = shortest_path(source, target, bidirectional=True)
+                if expected is None:
+                    self.assertIsNone(result)
+                    continue
+                self.assertEqual(len(result), len(expected))
+                person_id = source
+                for movie_id, next_id in result:
+                    self.assertIn((movie_id, next_id), neighbors_for_person(person_id))
+                    person_id = next_id
+                self.assertEqual(person_id, target)
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for filename in snapshot.SOURCE_FILES:
+            shutil.copy(os.path.join("small", filename), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_round_trip(self):
+        expected = load_graph(self.directory)
+        snapshot.compile_snapshot(self.directory)
+        graph = snapshot.load_snapshot(self.directory)
+        self.assertEqual(list(graph.person_movies), list(expected.person_movies))
+        self.assertEqual(list(graph.movie_stars), list(expected.movie_stars))
+        self.assertEqual({k: list(v) for k, v in graph.names.items()},
+                         {k: list(v) for k, v in expected.names.items()})
+        self.assertEqual(list(graph.person_ids), list(expected.person_ids))
+        self.assertEqual(graph.person("102"), {"name": "Kevin Bacon", "birth": "1958"})
+        self.assertEqual(graph.shortest_path("193", "158"), [('104257','102'), ('112384','158')])
+        self.assertNotIn("nobody", graph.person_index)
+
+    def test_snapshot_recompiles_from_snapshot(self):
+        snapshot.compile_snapshot(self.directory)
+        path = os.path.join(self.directory, "copy.snapshot")
+        snapshot.compile_snapshot(self.directory, snapshot.load_snapshot(self.directory), path)
+        with open(snapshot.snapshot_path(self.directory), "rb") as a, open(path, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+        graph = snapshot.load_snapshot(self.directory, path)
+        self.assertEqual(graph.movie("104257"), {"title": "A Few Good Men", "year": "1992"})
+        self.assertEqual(list(graph.names["tom hanks"]), [graph.person_index["158"]])
+
+    def test_snapshot_in_other_byte_order_is_stale(self):
+        snapshot.compile_snapshot(self.directory)
+        other = "big" if sys.byteorder == "little" else "little"
+        with mock.patch.object(sys, "byteorder", other):
+            self.assertFalse(snapshot.is_fresh(self.directory))
+
+    def test_open_graph_falls_back_to_csv(self):
+        snapshot.compile_snapshot(self.directory)
+        stars = os.path.join(self.directory, "stars.csv")
+        with open(stars, "a") as f:
+            f.write("102,95953\n")
+        compile_snapshot = snapshot.compile_snapshot
+
+        def compile_during_edit(*args, **kwargs):
+            path = compile_snapshot(*args, **kwargs)
+            with open(stars, "a") as f:
+                f.write("158,95953\n")
+            return path
+
+        with mock.patch.object(snapshot, "compile_snapshot", compile_during_edit):
+            graph = snapshot.open_graph(self.directory)
+        self.assertIsNone(graph.snapshot)
+        self.assertIn(("95953", "158"), graph.neighbors_for_person("102"))
+
+    def test_snapshot_is_stale_after_csv_changes(self):
+        snapshot.compile_snapshot(self.directory)
+        self.assertTrue(snapshot.is_fresh(self.directory))
+        with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+            f.write("102,95953\n")
+        self.assertIsNone(snapshot.load_snapshot(self.directory))
+
+        graph = snapshot.open_graph(self.directory)
+        self.assertTrue(snapshot.is_fresh(self.directory))
+        self.assertIn(("95953", "129"), graph.neighbors_for_person("102"))
+
+class TestStreamingLoad(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for filename in snapshot.SOURCE_FILES:
+            shutil.copy(os.path.join("small", filename), self.directory)
+        with open(os.path.join(self.directory, "stars.csv"), "a") as f:
+            f.write("999999,104257\n102,999999\n102,104257\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        load_data("small")
+
+    def test_dropped_edges_are_counted(self):
+        reports = []
+        graph = load_graph(self.directory, progress=lambda *report: reports.append(report))
+        stats = graph.load_stats
+        self.assertEqual(stats["star_rows"], 23)
+        self.assertEqual(stats["dropped_unknown_person"], 1)
+        self.assertEqual(stats["dropped_unknown_movie"], 1)
+        self.assertEqual(stats["dropped_duplicate"], 1)
+        self.assertEqual(stats["edges"], 20)
+        self.assertEqual([(stage, rows) for stage, rows, _, _ in reports],
+                         [("people", 16), ("movies", 5), ("stars", 23)])
+
+    def test_dict_loader_reports_dropped_rows(self):
+        reports = []
+        self.assertEqual(load_data(self.directory, progress=lambda *report: reports.append(report)), 2)
+        self.assertEqual([(stage, rows) for stage, rows, _, _ in reports],
+                         [("people", 16), ("movies", 5), ("stars", 23)])
+        self.assertNotIn("999999", degrees.people["102"]["movies"])
+        self.assertEqual(load_data(self.directory, compact=True), 2)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        batch.graph = load_graph("small")
+        fd, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write("193,158\nKevin Bacon,Tom Hanks\n193,914612\nNobody,102\n193,193\n")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_groups_queries_by_source(self):
+        groups, errors = batch.read_queries(self.path)
+        self.assertEqual(errors, [{"line": 4, "error": "Person not found: Nobody"}])
+        self.assertEqual(len(groups), 2)
+
+    def test_answers_match_shortest_path(self):
+        groups, _ = batch.read_queries(self.path)
+        records = [r for rs in batch.answer_queries(groups, workers=2) for r in rs]
+        by_line = {record["line"]: record for record in records}
+        self.assertEqual(by_line[1]["path"], [['104257','102'], ['112384','158']])
+        self.assertEqual(by_line[2]["degrees"], 1)
+        self.assertIsNone(by_line[3]["path"])
+        self.assertEqual(by_line[5]["path"], [])
+
+class TestCachedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = load_graph("small")
+        self.search = cache.CachedSearch(self.graph, maxsize=2, landmarks=3)
+
+    def test_cache_hits_and_reverse_reuse(self):
+        path = self.search.shortest_path("193", "158")
+        self.assertEqual(path, [('104257','102'), ('112384','158')])
+        self.assertEqual(self.search.shortest_path("193", "158"), path)
+        self.assertEqual(self.search.shortest_path("158", "193"),
+                         [('112384','102'), ('104257','193')])
+        stats = self.search.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+    def test_cache_is_bounded(self):
+        for target in ["102", "129", "158"]:
+            self.search.shortest_path("193", target)
+        self.assertEqual(len(self.search.cache), 2)
+
+    def test_landmarks_bound_distances(self):
+        landmarks = self.search.landmarks
+        for source in range(self.graph.num_people()):
+            for target in range(self.graph.num_people()):
+                path = self.graph.shortest_index_path(source, target)
+                if path is None:
+                    continue
+                self.assertFalse(landmarks.disconnected(source, target))
+                self.assertLessEqual(landmarks.lower_bound(source, target), len(path))
+                upper = landmarks.upper_bound(source, target)
+                if upper is not None:
+                    self.assertGreaterEqual(upper, len(path))
+
+    def test_unconnected_pair_is_rejected(self):
+        self.assertIsNone(self.search.shortest_path("914612", "102"))
+        self.assertIsNone(self.search.shortest_path("193", "158", max_degrees=1))
+
+class TestNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = resolver.NameIndex(load_graph("small"))
+
+    def test_exact_match(self):
+        self.assertEqual(self.index.resolve("kevin bacon")[0],
+                         {"id": "102", "name": "Kevin Bacon", "birth": "1958", "score": 1.0})
+
+    def test_unknown_name_has_no_exact_match(self):
+        self.assertEqual(self.index.exact("Kevin"), [])
+
+    def test_prefix_match(self):
+        names = [candidate["name"] for candidate in self.index.prefix("tom")]
+        self.assertEqual(names, ["Tom Cruise", "Tom Hanks"])
+
+    def test_fuzzy_match_ranks_closest_first(self):
+        self.assertEqual(self.index.resolve("Kevn Bacon")[0]["id"], "102")
+        self.assertEqual(self.index.fuzzy("zzzz"), [])
+
+class ResettingWriter():
+    """
+    Stream writer whose client has reset the connection.
+    """
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError("Connection reset by peer")
+
+    def close(self):
+        pass
+
+
+class TestService(unittest.TestCase):
+
+    async def get(self, port, target):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, body = response.split(b"\r\n\r\n", 1)
+        return int(head.split()[1]), json.loads(body)
+
+    async def run_queries(self):
+        app = service.DegreesService(load_graph("small"), workers=2, landmarks=2)
+        await app.start(port=0)
+        port = app.port()
+        try:
+            results = await asyncio.gather(
+                self.get(port, "/path?source=193&target=158"),
+                self.get(port, "/path?source=Kevin+Bacon&target=Tom+Hanks"),
+                self.get(port, "/path?source=914612&target=102"),
+                self.get(port, "/path?source=Kevn+Bacon&target=102"),
+            )
+            results.append(await self.get(port, "/path?source=158&target=193"))
+            results.append(await self.get(port, "/metrics"))
+        finally:
+            await app.close()
+        return results
+
+    async def disconnect_early(self):
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        app = service.DegreesService(load_graph("small"), workers=1)
+        try:
+            # A client that resets the connection while its answer is sent
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"GET /metrics HTTP/1.1\r\n\r\n")
+            reader.feed_eof()
+            await app.handle(reader, ResettingWriter())
+            # A search cancelled before its worker finishes
+            task = asyncio.ensure_future(app.run_search(0, 1))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.2)
+        finally:
+            await app.close()
+        return app.requests, errors
+
+    def test_client_disconnects_and_cancellation(self):
+        requests, errors = asyncio.run(self.disconnect_early())
+        self.assertEqual(requests, 0)
+        self.assertEqual(errors, [])
+
+    def test_concurrent_queries_and_metrics(self):
+        path, names, unconnected, unknown, reverse, metrics = asyncio.run(self.run_queries())
+        self.assertEqual(path[0], 200)
+        self.assertEqual([(step["movie_id"], step["person_id"]) for step in path[1]["path"]],
+                         [('104257','102'), ('112384','158')])
+        self.assertEqual(names[1]["degrees"], 1)
+        self.assertIsNone(unconnected[1]["path"])
+        self.assertEqual(unknown[0], 404)
+        self.assertEqual(unknown[1]["candidates"][0]["id"], "102")
+        self.assertEqual(reverse[1]["degrees"], 2)
+
+        self.assertEqual(metrics[1]["graph"]["people"], 16)
+        self.assertGreaterEqual(metrics[1]["cache"]["hits"], 1)
+        self.assertEqual(metrics[1]["requests"], 5)
+        self.assertIsNotNone(metrics[1]["latency_seconds"]["p50"])
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        load_data("small")
+
+    def test_generated_dataset_loads(self):
+        people, movies, edges = benchmark.generate_dataset(self.directory, 500, seed=1)
+        self.assertEqual(edges, 500)
+        graph = load_graph(self.directory)
+        self.assertEqual(graph.num_people(), people)
+        self.assertEqual(graph.num_movies(), movies)
+        self.assertEqual(graph.num_edges(), 500)
+
+    def test_strategies_agree(self):
+        benchmark.generate_dataset(self.directory, 500, seed=2)
+        report = benchmark.benchmark_dataset(self.directory, 10, 0, benchmark.STRATEGIES)
+        self.assertTrue(report["consistent"])
+        self.assertEqual(set(report["search"]), set(benchmark.STRATEGIES))
+        self.assertLess(report["fuzzy_seconds"]["mean"], 0.05)
+        self.assertEqual(set(report["memory_bytes"]), {"dict", "compact", "snapshot"})
+
+    def test_compact_memory(self):
+        benchmark.generate_dataset(self.directory, 5000, seed=0)
+        _, dict_bytes = benchmark.traced_memory(load_data, self.directory)
+        _, compact_bytes = benchmark.traced_memory(load_graph, self.directory)
+        # About 14x, as on 300,000 edges; ids, names and births were most of it
+        self.assertGreater(dict_bytes, 10 * compact_bytes)
+
+    def test_fuzzy_latency(self):
+        # 90,000 names, as many as a 300,000 edge dataset has
+        rng = random.Random(0)
+        star_graph = StarGraph()
+        for person in range(90000):
+            star_graph.add_person(str(person), benchmark.synthetic_name(rng), "")
+        fuzzy = benchmark.time_fuzzy(star_graph, rng)
+        self.assertLess(fuzzy["mean"], 0.02)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
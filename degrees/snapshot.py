@@ -0,0 +1,240 @@
+"""
+Versioned binary snapshot of a degrees dataset.
+
+Parsing people.csv, movies.csv and stars.csv dominates startup on `large`.
+`compile_snapshot` writes a loaded StarGraph once; `load_snapshot` memory maps
+it so the CSR arrays, the string tables and the id index slots are used
+straight from the page cache, and strings are only decoded when read. A
+snapshot records the mtime and size of every CSV it was built from and the
+byte order it was written in, and is ignored as soon as either differs.
+
+Usage: python snapshot.py directory
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+
+from graph import StarGraph, load_graph, print_progress
+from tables import KeyIndex, NameTable, StringTable
+
+MAGIC = b"DEGSNAP\0"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_NAME = "degrees.snapshot"
+SOURCE_FILES = ("people.csv", "movies.csv", "stars.csv")
+
+PREAMBLE = struct.Struct("<8sII")
+# StringTables, each stored as a <name>_offsets int array and a <name>_blob
+TABLES = ("person_ids", "person_names", "person_births",
+          "movie_ids", "movie_titles", "movie_years", "name_keys")
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, SNAPSHOT_NAME)
+
+
+def source_stats(directory):
+    """
+    Returns the mtime and size of each CSV file in a dataset directory.
+    """
+    stats = {}
+    for filename in SOURCE_FILES:
+        st = os.stat(os.path.join(directory, filename))
+        stats[filename] = [st.st_mtime_ns, st.st_size]
+    return stats
+
+
+def compile_snapshot(directory, graph=None, path=None, progress=None):
+    """
+    Writes the graph of a dataset directory to a binary snapshot.
+    Loads it from CSV first if no graph is given. Returns the snapshot path.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+    sources = source_stats(directory)
+    if graph is None:
+        graph = load_graph(directory, progress)
+
+    names = graph.names
+    if names.stale:
+        names.build()
+    blobs = {
+        "person_offsets": graph.person_offsets,
+        "person_movies": graph.person_movies,
+        "movie_offsets": graph.movie_offsets,
+        "movie_stars": graph.movie_stars,
+        "name_offsets": names.offsets,
+        "name_people": names.people,
+        "person_index": graph.person_index.slots,
+        "movie_index": graph.movie_index.slots,
+        "name_index": names.index.slots,
+    }
+    tables = {
+        "person_ids": graph.person_ids,
+        "person_names": graph.person_names,
+        "person_births": graph.person_births,
+        "movie_ids": graph.movie_ids,
+        "movie_titles": graph.movie_titles,
+        "movie_years": graph.movie_years,
+        "name_keys": names.keys,
+    }
+    for name, table in tables.items():
+        blobs[f"{name}_offsets"] = table.offsets
+        blobs[f"{name}_blob"] = table.blob
+
+    # Lay sections out at 8 byte aligned offsets relative to the data start.
+    # Arrays and memoryviews of a loaded snapshot are written as they are.
+    sections = {}
+    offset = 0
+    for name in blobs:
+        size = memoryview(blobs[name]).nbytes
+        sections[name] = [offset, size]
+        offset += _padded(size)
+
+    header = json.dumps({
+        "sources": sources,
+        "byteorder": sys.byteorder,
+        "counts": {
+            "people": graph.num_people(),
+            "movies": graph.num_movies(),
+            "edges": graph.num_edges(),
+            "names": len(names),
+        },
+        "load_stats": graph.load_stats,
+        "sections": sections,
+    }).encode("utf-8")
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * (_padded(f.tell()) - f.tell()))
+        for name in blobs:
+            size = f.write(blobs[name])
+            f.write(b"\0" * (_padded(size) - size))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path):
+    """
+    Returns (version, header dict, data start offset) of a snapshot file,
+    or None if the file is not a snapshot.
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            return None
+        magic, version, header_len = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            return None
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return version, header, _padded(PREAMBLE.size + header_len)
+
+
+def is_fresh(directory, path=None):
+    """
+    Returns True if a snapshot exists, has the current version and
+    was built from the CSV files as they are now.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+    if not os.path.exists(path):
+        return False
+    info = read_header(path)
+    if info is None:
+        return False
+    version, header, _ = info
+    # Int arrays are mapped as they are, so they must be in native byte order
+    if version != SNAPSHOT_VERSION or header.get("byteorder") != sys.byteorder:
+        return False
+    try:
+        return header["sources"] == source_stats(directory)
+    except FileNotFoundError:
+        return False
+
+
+def load_snapshot(directory, path=None):
+    """
+    Memory maps a snapshot into a StarGraph without copying its sections.
+    Returns None if the snapshot is missing or stale.
+    """
+    if path is None:
+        path = snapshot_path(directory)
+    if not is_fresh(directory, path):
+        return None
+    _, header, data_start = read_header(path)
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+
+    def section(name):
+        offset, size = header["sections"][name]
+        start = data_start + offset
+        return view[start:start + size]
+
+    def ints(name):
+        return section(name).cast("i")
+
+    def table(name):
+        return StringTable(ints(f"{name}_offsets"), section(f"{name}_blob"))
+
+    graph = StarGraph()
+    graph.load_stats = header.get("load_stats", {})
+    graph.person_offsets = ints("person_offsets")
+    graph.person_movies = ints("person_movies")
+    graph.movie_offsets = ints("movie_offsets")
+    graph.movie_stars = ints("movie_stars")
+
+    # Strings stay in the mapping and are decoded as they are read
+    graph.person_ids = table("person_ids")
+    graph.person_names = table("person_names")
+    graph.person_births = table("person_births")
+    graph.movie_ids = table("movie_ids")
+    graph.movie_titles = table("movie_titles")
+    graph.movie_years = table("movie_years")
+    graph.person_index = KeyIndex(graph.person_ids, ints("person_index"))
+    graph.movie_index = KeyIndex(graph.movie_ids, ints("movie_index"))
+
+    name_keys = table("name_keys")
+    graph.names = NameTable(name_keys, KeyIndex(name_keys, ints("name_index")),
+                            ints("name_offsets"), ints("name_people"))
+
+    # Keep the mapping alive as long as the graph uses it
+    graph.snapshot = mm
+    return graph
+
+
+def open_graph(directory, progress=None):
+    """
+    Returns the StarGraph for a dataset directory, from its snapshot when
+    that is fresh. A stale snapshot is recompiled; without one, or if a CSV
+    file changes again while recompiling, the CSV files are loaded directly.
+    """
+    graph = load_snapshot(directory)
+    if graph is None and os.path.exists(snapshot_path(directory)):
+        compile_snapshot(directory, progress=progress)
+        graph = load_snapshot(directory)
+    if graph is None:
+        graph = load_graph(directory, progress)
+    return graph
+
+
+def _padded(size):
+    return (size + 7) & ~7
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    directory = sys.argv[1]
+    print("Compiling snapshot...")
+    path = compile_snapshot(directory, progress=print_progress)
+    print(f"Snapshot written to {path} ({os.path.getsize(path)} bytes).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Compact string tables for StarGraph metadata.
+
+A Python str costs about 50 bytes before its text, and a dict entry
+mapping it to an index as much again, which made ids, names and birth
+years most of a loaded StarGraph. Here every column of strings is one
+UTF-8 blob plus an offsets array, decoded only when a value is read:
+
+    StringTable  string i is blob[offsets[i]:offsets[i + 1]]
+    KeyIndex     string -> position in a StringTable, by open addressing
+                 over an int array of slots
+    NameTable    lowercase name -> person indices, as CSR arrays
+
+Keys are hashed with CRC-32 of their UTF-8 bytes rather than hash(), which
+is salted per process, so the slots can be stored in a snapshot and used
+from the memory map as they are.
+"""
+
+from array import array
+from zlib import crc32
+
+# Slots of an empty KeyIndex; it doubles whenever it is half full
+MIN_SLOTS = 8
+
+
+class StringTable():
+    """
+    Sequence of strings stored as one UTF-8 blob and n + 1 offsets.
+    offsets and blob may be arrays being appended to, or read-only
+    memoryviews of a snapshot.
+    """
+    def __init__(self, offsets=None, blob=None):
+        self.offsets = array("i", [0]) if offsets is None else offsets
+        self.blob = bytearray() if blob is None else blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return str(self.raw(i), "utf-8")
+
+    def __iter__(self):
+        offsets, blob = self.offsets, self.blob
+        for i in range(len(self)):
+            yield str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def raw(self, i):
+        """
+        Returns the UTF-8 bytes of string i.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    def append(self, data):
+        """
+        Appends a string, or its UTF-8 bytes. Returns its position.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        blob = self.blob
+        blob += data
+        self.offsets.append(len(blob))
+        return len(self.offsets) - 2
+
+
+class KeyIndex():
+    """
+    Maps the strings of a StringTable to their positions, read like a dict.
+    A string added twice maps to its last position.
+    """
+    def __init__(self, table, slots=None):
+        self.table = table
+        if slots is None:
+            slots = array("i", [-1]) * MIN_SLOTS
+            self.count = 0
+        else:
+            self.count = len(table)
+        self.slots = slots
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        position = self.get(key)
+        if position is None:
+            raise KeyError(key)
+        return position
+
+    def get(self, key, default=None):
+        position = self.position(key.encode("utf-8"))
+        return default if position < 0 else position
+
+    def position(self, data):
+        """
+        Returns the position of a string given as UTF-8 bytes, or -1.
+        """
+        return self.slots[self._find(data)]
+
+    def add(self, position, data=None):
+        """
+        Indexes the string at a position of the table, given its UTF-8
+        bytes if the caller has them.
+        """
+        if 2 * (self.count + 1) > len(self.slots):
+            self._resize(2 * len(self.slots))
+        if data is None:
+            data = self.table.raw(position)
+        slot = self._find(data)
+        if self.slots[slot] < 0:
+            self.count += 1
+        self.slots[slot] = position
+
+    def _find(self, data):
+        """
+        Returns the slot holding data, or the empty slot where it belongs.
+        """
+        slots = self.slots
+        offsets, blob = self.table.offsets, self.table.blob
+        mask = len(slots) - 1
+        slot = crc32(data) & mask
+        while True:
+            position = slots[slot]
+            if position < 0 or blob[offsets[position]:offsets[position + 1]] == data:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _resize(self, size):
+        offsets, blob = self.table.offsets, self.table.blob
+        positions = [position for position in self.slots if position >= 0]
+        slots = self.slots = array("i", [-1]) * size
+        mask = size - 1
+        for position in positions:
+            # Every key is distinct, so only empty slots need probing
+            slot = crc32(blob[offsets[position]:offsets[position + 1]]) & mask
+            while slots[slot] >= 0:
+                slot = (slot + 1) & mask
+            slots[slot] = position
+
+
+class NameTable():
+    """
+    Person indices grouped by lowercase name. The people named keys[k]
+    are people[offsets[k]:offsets[k + 1]], in the order they were added.
+
+    Names are added one person at a time; the CSR arrays are rebuilt from
+    person_keys, the name of every person, the first time they are read
+    after an add. A table loaded from a snapshot has no person_keys.
+    """
+    def __init__(self, keys=None, index=None, offsets=None, people=None):
+        self.keys = StringTable() if keys is None else keys
+        self.index = KeyIndex(self.keys) if index is None else index
+        self.offsets = array("i", [0]) if offsets is None else offsets
+        self.people = array("i") if people is None else people
+        self.person_keys = array("i") if keys is None else None
+        self.stale = False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        people = self.get(name)
+        if people is None:
+            raise KeyError(name)
+        return people
+
+    def get(self, name, default=None):
+        """
+        Returns the person indices with a lowercase name.
+        """
+        k = self.index.get(name)
+        if k is None:
+            return default
+        if self.stale:
+            self.build()
+        return self.people[self.offsets[k]:self.offsets[k + 1]]
+
+    def items(self):
+        for name in self.keys:
+            yield name, self[name]
+
+    def add(self, name, person):
+        """
+        Records that a person index, the next one, has a lowercase name.
+        """
+        if len(self.person_keys) != person:
+            raise ValueError("people must be added in index order")
+        data = name.encode("utf-8")
+        k = self.index.position(data)
+        if k < 0:
+            k = self.keys.append(data)
+            self.index.add(k, data)
+        self.person_keys.append(k)
+        self.stale = True
+
+    def build(self):
+        """
+        Rebuilds the CSR arrays from person_keys with a counting sort.
+        """
+        offsets = array("i", [0]) * (len(self.keys) + 1)
+        for k in self.person_keys:
+            offsets[k + 1] += 1
+        for k in range(len(self.keys)):
+            offsets[k + 1] += offsets[k]
+        filled = array("i", offsets)
+        people = array("i", [0]) * len(self.person_keys)
+        for person, k in enumerate(self.person_keys):
+            people[filled[k]] = person
+            filled[k] += 1
+        self.offsets = offsets
+        self.people = people
+        self.stale = False
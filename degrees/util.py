@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +10,16 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Number of nodes in the frontier for each state
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +28,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard(node.state)
             return node
 
+    def discard(self, state):
+        count = self.states[state] - 1
+        if count == 0:
+            del self.states[state]
+        else:
+            self.states[state] = count
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +46,23 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard(node.state)
             return node
+
+
+class ExploredSet():
+    """
+    Explored states of a search, for any hashable state.
+    """
+    def __init__(self):
+        self.states = set()
+
+    def add(self, state):
+        self.states.add(state)
+
+    def __contains__(self, state):
+        return state in self.states
+
+    def __len__(self):
+        return len(self.states)
@@ -0,0 +1,96 @@
+"""
+Compares the PageRank solvers of solvers.METHODS.
+
+Every method is run on the bundled corpora and on synthetic graphs of
+each size, and the iterations and time to reach the tolerance are
+printed, with the L1 distance from a tightly converged power iteration.
+
+Usage: python benchmark.py [--sizes N ...] [--tolerance T] [--seed S] [--output report.json]
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+import pagerank
+from graph import LinkGraph
+from solvers import METHODS, solve
+
+CORPORA = ("corpus0", "corpus1", "corpus2")
+SIZES = (10 ** 4, 10 ** 5)
+DAMPING = 0.85
+
+# Tolerance of the reference ranks each method is checked against
+REFERENCE_TOLERANCE = 1e-12
+
+
+def synthetic_graph(n, links_per_page=8, dangling=0.1, seed=0):
+    """
+    Returns a LinkGraph of n pages where a `dangling` fraction of pages has
+    no links and the others link to a geometric number of pages chosen with
+    Zipf-like popularity, so in-degrees follow a power law like the web's.
+    """
+    rng = np.random.default_rng(seed)
+    out_degree = np.minimum(rng.geometric(1 / links_per_page, n), n - 1)
+    out_degree[rng.random(n) < dangling] = 0
+    popularity = 1 / np.arange(1, n + 1)
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=offsets[1:])
+    targets = rng.choice(n, size=offsets[-1], p=popularity).astype(np.int32)
+    sources = np.repeat(np.arange(n, dtype=np.int32), out_degree)
+    # Drop self-links and repeated links, as the crawler does
+    keep = targets != sources
+    links = np.unique(sources[keep].astype(np.int64) * n + targets[keep])
+    counts = np.bincount(links // n, minlength=n)
+    offsets[1:] = np.cumsum(counts)
+    return LinkGraph([f"{i}.html" for i in range(n)], offsets, links % n)
+
+
+def benchmark_graph(graph, tolerance):
+    """
+    Runs every method on a LinkGraph. Returns a report dictionary.
+    """
+    reference = solve(graph, DAMPING, "power", REFERENCE_TOLERANCE).rank
+    report = {"pages": len(graph), "links": graph.num_links(), "methods": {}}
+    for method in METHODS:
+        result = solve(graph, DAMPING, method, tolerance)
+        report["methods"][method] = {
+            "iterations": result.iterations,
+            "seconds": result.seconds,
+            "residual": result.residuals[-1] if result.residuals else 0.0,
+            "error": float(np.abs(result.rank - reference).sum()),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PageRank solvers.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES))
+    parser.add_argument("--tolerance", type=float, default=1e-8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    graphs = [(directory, LinkGraph.from_corpus(pagerank.crawl(directory))) for directory in CORPORA]
+    graphs += [(f"synthetic {n}", synthetic_graph(n, seed=args.seed)) for n in args.sizes]
+
+    report = {"tolerance": args.tolerance, "damping": DAMPING, "graphs": {}}
+    for name, graph in graphs:
+        result = benchmark_graph(graph, args.tolerance)
+        report["graphs"][name] = result
+        print(f"{name}: {result['pages']} pages, {result['links']} links")
+        for method, run in result["methods"].items():
+            print(f"  {method:14} {run['iterations']:4} iterations {run['seconds']:8.3f}s"
+                  f"  error {run['error']:.1e}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+On-disk cache of a corpus's link graph.
+
+Crawling parses every HTML file of a corpus. `write_cache` stores the
+crawled LinkGraph (page names and the CSR link arrays, whose offsets give
+every out-degree) in one binary file inside the corpus directory, and
+`load_cache` memory maps it back, so a run costs a stat per page
+instead of a parse per page. The cache is keyed by a digest of the
+directory's manifest, the name, size and mtime of every .html file, so
+adding, removing or editing any page makes it stale.
+
+The file is a fixed header followed by the offsets, targets and page
+names, at positions that follow from the counts in the header.
+
+Usage: python cache.py directory
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from crawler import CrawlStats, crawl_graph
+from graph import LinkGraph
+
+MAGIC = b"PRCACHE\0"
+CACHE_VERSION = 2
+CACHE_NAME = "pagerank.cache"
+DIGEST_SIZE = 16
+
+# Separator for the page name table, never part of a file name
+SEPARATOR = "\0"
+
+# Magic, version, manifest digest, then the page count, link count and
+# bytes of page names. Its size is a multiple of 8, so the int64 offsets
+# that follow it, then the int32 targets and the page names, need no padding.
+HEADER = struct.Struct(f"<8sI4x{DIGEST_SIZE}sqqq")
+
+
+def cache_path(directory):
+    return os.path.join(directory, CACHE_NAME)
+
+
+def manifest_digest(directory):
+    """
+    Returns a digest of the name, size and mtime of every page in a corpus directory.
+    """
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(".html"):
+                st = entry.stat()
+                entries.append(f"{entry.name}{SEPARATOR}{st.st_size}{SEPARATOR}{st.st_mtime_ns}")
+    entries.sort()
+    return hashlib.blake2b("\n".join(entries).encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+def write_cache(directory, graph, manifest=None, path=None):
+    """
+    Writes the LinkGraph of a corpus directory to its cache. Pass the
+    manifest digest taken before crawling, so pages edited during the
+    crawl make the cache stale. Returns the cache path.
+    """
+    if path is None:
+        path = cache_path(directory)
+    if manifest is None:
+        manifest = manifest_digest(directory)
+
+    names = SEPARATOR.join(graph.pages).encode("utf-8")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, CACHE_VERSION, manifest, len(graph), graph.num_links(), len(names)))
+        f.write(np.ascontiguousarray(graph.offsets, dtype=np.int64).tobytes())
+        f.write(np.ascontiguousarray(graph.targets, dtype=np.int32).tobytes())
+        f.write(names)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_cache(directory, path=None):
+    """
+    Memory maps the cached LinkGraph of a corpus directory.
+    Returns None if there is no cache or it is stale.
+    """
+    if path is None:
+        path = cache_path(directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        magic, version, manifest, pages, links, names_size = HEADER.unpack(header)
+        if magic != MAGIC or version != CACHE_VERSION or manifest != manifest_digest(directory):
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    offsets_start = HEADER.size
+    targets_start = offsets_start + 8 * (pages + 1)
+    names_start = targets_start + 4 * links
+    if len(mm) != names_start + names_size:
+        return None
+    offsets = np.frombuffer(mm, dtype=np.int64, count=pages + 1, offset=offsets_start)
+    targets = np.frombuffer(mm, dtype=np.int32, count=links, offset=targets_start)
+    names = mm[names_start:].decode("utf-8").split(SEPARATOR) if pages else []
+    graph = LinkGraph(names, offsets, targets)
+    # Keep the mapping alive as long as the graph uses it
+    graph.cache = mm
+    return graph
+
+
+def open_graph(directory, workers=None, stats=None):
+    """
+    Returns the LinkGraph of a corpus directory from its cache when that is
+    fresh, else crawls the directory and writes the cache. If a CrawlStats
+    is given, the work of any crawl is added to it.
+    """
+    graph = load_cache(directory)
+    if graph is not None:
+        return graph
+    manifest = manifest_digest(directory)
+    graph = crawl_graph(directory, workers, stats=stats)
+    write_cache(directory, graph, manifest)
+    return graph
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python cache.py directory")
+    directory = sys.argv[1]
+    stats = CrawlStats()
+    manifest = manifest_digest(directory)
+    graph = crawl_graph(directory, stats=stats)
+    path = write_cache(directory, graph, manifest)
+    print(stats.summary())
+    print(f"Cache written to {path} ({os.path.getsize(path)} bytes).")
+
+
+if __name__ == "__main__":
+    main()
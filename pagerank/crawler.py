@@ -0,0 +1,225 @@
+"""
+Parallel streaming crawler for directories of HTML pages.
+
+Pages are numbered by sorted file name before any file is read, so worker
+processes can turn every link straight into a page number. Each file is
+read in chunks and scanned for hrefs as it streams in; a tag cut in two by
+a chunk boundary is carried over to the next chunk. The links of every
+page come back as compact integer arrays and are laid out into a LinkGraph
+without building any per-page sets of names.
+
+Usage: python crawler.py directory [--workers N]
+"""
+
+import argparse
+import codecs
+import hashlib
+import multiprocessing
+import os
+import re
+import time
+from array import array
+
+from graph import LinkGraph
+
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a file at a time
+CHUNK_SIZE = 1 << 16
+
+# Bytes in the content digests of page_details
+DIGEST_SIZE = 16
+
+# Below this many pages the crawl runs in-process; forking costs more
+PARALLEL_MIN_PAGES = 256
+
+# Crawl state of a worker process, set by _init_worker
+_directory = None
+_index = None
+_chunk_size = CHUNK_SIZE
+_scan_function = None
+
+
+class CrawlStats():
+    """
+    Work done by a crawl: pages and bytes read, links kept and wall time.
+    """
+    def __init__(self):
+        self.pages = 0
+        self.links = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def pages_per_second(self):
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"Crawled {self.pages} pages, {self.links} links, {self.bytes} bytes "
+                f"in {self.seconds:.3f}s ({self.pages_per_second():.0f} pages/sec)")
+
+
+def iter_links(f, chunk_size=CHUNK_SIZE):
+    """
+    Yields the href of every link in a text file object, reading it
+    chunk_size characters at a time.
+    """
+    carry = ""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        text = carry + chunk
+        end = 0
+        for match in LINK_PATTERN.finditer(text):
+            yield match.group(1)
+            end = match.end()
+        # Keep whatever could still be the start of a tag
+        tag = text.rfind("<")
+        carry = text[tag:] if tag >= end else ""
+    for match in LINK_PATTERN.finditer(carry):
+        yield match.group(1)
+
+
+def is_page_name(link):
+    """
+    Returns True if a link could name a page of a corpus directory.
+    """
+    return link.endswith(".html") and "/" not in link
+
+
+def _page_targets(f, index, page, chunk_size, unresolved=None):
+    """
+    Returns the sorted page numbers the links of a text file point to.
+    Links to page names missing from the index are added to unresolved.
+    """
+    targets = set()
+    for link in iter_links(f, chunk_size):
+        target = index.get(link)
+        if target is None:
+            if unresolved is not None and is_page_name(link):
+                unresolved.add(link)
+        elif target != page:
+            targets.add(target)
+    return array("i", sorted(targets))
+
+
+def page_links(path, index, page, chunk_size=CHUNK_SIZE):
+    """
+    Returns (size in bytes, sorted page numbers linked to) for the file of
+    page number `page`. Links outside the index and to the page itself
+    are left out.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        targets = _page_targets(f, index, page, chunk_size)
+    return os.path.getsize(path), targets
+
+
+class _DigestReader():
+    """
+    Reads text from a binary file, hashing the raw bytes as they go by.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.hash = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def read(self, size):
+        while True:
+            data = self.f.read(size)
+            self.hash.update(data)
+            text = self.decoder.decode(data, final=not data)
+            if text or not data:
+                return text
+
+
+def page_details(path, index, page, chunk_size=CHUNK_SIZE):
+    """
+    Returns (size in bytes, sorted page numbers linked to, sorted names of
+    linked pages missing from the index, digest of the file's contents),
+    reading the file once.
+    """
+    unresolved = set()
+    with open(path, "rb") as f:
+        reader = _DigestReader(f)
+        targets = _page_targets(reader, index, page, chunk_size, unresolved)
+    return os.path.getsize(path), targets, sorted(unresolved), reader.hash.digest()
+
+
+def _init_worker(directory, index, chunk_size, scan):
+    global _directory, _index, _chunk_size, _scan_function
+    _directory = directory
+    _index = index
+    _chunk_size = chunk_size
+    _scan_function = scan
+
+
+def _scan(item):
+    page, filename = item
+    return _scan_function(os.path.join(_directory, filename), _index, page, _chunk_size)
+
+
+def scan_pages(directory, items, index, workers=None, chunk_size=CHUNK_SIZE, scan=page_links):
+    """
+    Yields scan(path, index, page, chunk_size) for every (page, filename)
+    of items, in order, running the scans on `workers` processes (one per
+    CPU by default) when there are enough of them.
+    """
+    items = list(items)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(items) < PARALLEL_MIN_PAGES:
+        for page, filename in items:
+            yield scan(os.path.join(directory, filename), index, page, chunk_size)
+        return
+    # Forked workers inherit the index instead of having it pickled
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers, _init_worker, (directory, index, chunk_size, scan)) as pool:
+        yield from pool.imap(_scan, items, chunksize=64)
+
+
+def list_pages(directory):
+    """
+    Returns the .html file names of a directory, in page number order.
+    """
+    return sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+
+
+def crawl_graph(directory, workers=None, chunk_size=CHUNK_SIZE, stats=None):
+    """
+    Returns the LinkGraph of a directory of HTML pages, scanning files on
+    `workers` processes (one per CPU by default). If a CrawlStats is given,
+    the work done is added to it.
+    """
+    start = time.perf_counter()
+    pages = list_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+
+    offsets = array("q", [0])
+    targets = array("i")
+    total_bytes = 0
+    for size, links in scan_pages(directory, enumerate(pages), index, workers, chunk_size):
+        total_bytes += size
+        targets.extend(links)
+        offsets.append(len(targets))
+
+    graph = LinkGraph(pages, offsets, targets)
+    if stats is not None:
+        stats.pages += len(pages)
+        stats.links += len(targets)
+        stats.bytes += total_bytes
+        stats.seconds += time.perf_counter() - start
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a directory of HTML pages.")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    stats = CrawlStats()
+    crawl_graph(args.directory, args.workers, stats=stats)
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Sparse link graph and power iteration for PageRank.
+
+A corpus is converted once into a LinkGraph: pages numbered 0..n-1 and
+their outbound links in compressed sparse row (CSR) arrays. The link part
+of the transition model is then the column-stochastic matrix M with
+M[j, i] = 1 / outdegree(i) for every link i -> j, and one PageRank step is
+
+    rank' = damping * (M @ rank + dangling mass / n) + (1 - damping) / n
+
+where the dangling mass is the rank held by pages without links, which
+are treated as linking to every page, themselves included.
+
+Personalized PageRank replaces both uniform 1 / n jumps with a teleport
+distribution v:
+
+    rank' = damping * (M @ rank + dangling mass * v) + (1 - damping) * v
+
+and K teleport distributions stacked as the columns of an n x K block are
+solved together, one sparse product with the whole block per step when
+SciPy is installed. Without SciPy the block is propagated a column at a
+time, which costs about as much as K separate solves.
+
+M @ rank uses scipy.sparse when SciPy is installed and np.bincount over
+the link arrays otherwise.
+
+sample_walks estimates the same ranks by Monte Carlo, moving many random
+surfers at once as arrays of page numbers.
+"""
+
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+# Power iteration stops once an update changes the ranks by less than this, in L1 norm
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Random surfers moved together by sample_walks, and the steps each one
+# takes before it is counted, so samples are not biased towards its start
+WALKERS = 100000
+BURN_IN = 50
+
+
+class LinkGraph():
+    """
+    Pages and their outbound links.
+
+        pages       page names, by page number
+        index       maps page names to page numbers
+        offsets     links of page i are targets[offsets[i]:offsets[i + 1]]
+        targets     page numbers linked to, grouped by source page
+    """
+    def __init__(self, pages, offsets, targets):
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        if len(self.offsets) != len(self.pages) + 1:
+            raise ValueError("offsets must have one entry per page plus one")
+
+        self.out_degree = np.diff(self.offsets)
+        self.dangling = self.out_degree == 0
+        self.sources = np.repeat(np.arange(len(self.pages)), self.out_degree)
+        # Weight of each link in M, so a page's rank is split evenly over its links
+        self.weights = 1.0 / self.out_degree[self.sources]
+        self._matrix = None
+        self._link_targets = None
+        if sparse is not None:
+            n = len(self.pages)
+            self._matrix = sparse.csr_matrix(
+                (self.weights, (self.targets, self.sources)), shape=(n, n))
+        else:
+            # bincount would convert int32 targets to intp on every call
+            self._link_targets = self.targets.astype(np.intp)
+            self._share = np.divide(1.0, self.out_degree, out=np.zeros(len(self.pages)),
+                                    where=~self.dangling)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Returns the LinkGraph of a corpus dictionary mapping each page to
+        the set of pages it links to. Links to pages outside the corpus and
+        from a page to itself are left out.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = [0]
+        targets = []
+        for page in pages:
+            targets.extend(sorted(index[link] for link in corpus[page]
+                                  if link in index and link != page))
+            offsets.append(len(targets))
+        return cls(pages, offsets, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def num_links(self):
+        return len(self.targets)
+
+    def links(self, page):
+        """
+        Returns the page numbers page number `page` links to.
+        """
+        return self.targets[self.offsets[page]:self.offsets[page + 1]]
+
+    def propagate(self, rank):
+        """
+        Returns M @ rank: the rank every page receives over links. rank is
+        a vector, or an n x K block of K rank vectors.
+        """
+        if self._matrix is not None:
+            return self._matrix @ rank
+        n = len(self.pages)
+        if rank.ndim == 1:
+            # Split each page's rank over its links before gathering, not per link
+            return np.bincount(self._link_targets, weights=(rank * self._share)[self.sources],
+                               minlength=n)
+        # NumPy has no sparse product with a block. Each column is gathered
+        # and scattered on its own, which costs about as much per column as
+        # one vector; kept contiguous (power_iteration holds blocks in
+        # Fortran order) this beats grouping the links with reduceat
+        columns = np.ascontiguousarray(rank.T) * self._share
+        result = np.empty_like(columns)
+        for k, column in enumerate(columns):
+            result[k] = np.bincount(self._link_targets, weights=column[self.sources], minlength=n)
+        return result.T
+
+    def step(self, rank, damping_factor, teleport=None):
+        """
+        Returns the ranks after one step of the random surfer, who jumps to
+        pages by the teleport distribution, uniformly if it is None. With an
+        n x K block of teleport distributions, rank is an n x K block too.
+        """
+        if teleport is None:
+            teleport = 1 / len(self.pages)
+        dangling_mass = rank[self.dangling].sum(axis=0)
+        return (damping_factor * (self.propagate(rank) + dangling_mass * teleport)
+                + (1 - damping_factor) * teleport)
+
+    def teleport_distribution(self, weights):
+        """
+        Returns the teleport distribution over pages of a dictionary mapping
+        page names to non-negative weights, which are scaled to sum to 1.
+        """
+        vector = np.zeros(len(self.pages))
+        for page, weight in weights.items():
+            if page not in self.index:
+                raise ValueError(f"Unknown page {page!r}")
+            if weight < 0:
+                raise ValueError(f"Negative teleport weight for {page!r}")
+            vector[self.index[page]] = weight
+        total = vector.sum()
+        if total <= 0:
+            raise ValueError("Teleport weights must not all be zero")
+        return vector / total
+
+    def to_dict(self, rank):
+        return {page: float(value) for page, value in zip(self.pages, rank)}
+
+    def to_corpus(self):
+        """
+        Returns the corpus dictionary mapping each page to the set of pages it links to.
+        """
+        return {page: {self.pages[target] for target in self.links(i)}
+                for i, page in enumerate(self.pages)}
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    start=None, residuals=None, teleport=None):
+    """
+    Returns the PageRank vector of a LinkGraph, starting from the uniform
+    distribution, or from the distribution `start` (such as the ranks
+    before a small change to the graph), and stepping until the L1 change
+    falls below tolerance. The change of every step is appended to
+    residuals if a list is given.
+
+    A teleport distribution gives personalized PageRank, started from the
+    teleport distribution itself. An n x K block of them returns the
+    n x K block of their rankings, stepped until every column's change
+    falls below tolerance.
+    Raises ValueError if that takes more than max_iterations steps.
+    """
+    n = len(graph)
+    # SciPy multiplies blocks held row by row; the NumPy fallback works
+    # column by column, so there each ranking is kept contiguous
+    order = "C" if graph._matrix is not None else "F"
+    if teleport is not None:
+        teleport = np.asarray(teleport, dtype=np.float64, order=order)
+        if teleport.ndim not in (1, 2) or teleport.shape[0] != n:
+            raise ValueError("teleport must have one row per page")
+    if n == 0:
+        return np.zeros(0) if teleport is None else np.zeros(teleport.shape)
+    if start is not None:
+        rank = np.asarray(start, dtype=np.float64, order=order)
+        expected = (n,) if teleport is None else teleport.shape
+        if rank.shape != expected:
+            raise ValueError("start must have one value per page and teleport vector")
+    elif teleport is not None:
+        rank = teleport.copy(order=order)
+    else:
+        rank = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        new_rank = graph.step(rank, damping_factor, teleport)
+        change = np.abs(new_rank - rank).sum(axis=0).max()
+        rank = new_rank
+        if residuals is not None:
+            residuals.append(float(change))
+        if change < tolerance:
+            return rank
+    raise ValueError(f"PageRank did not converge within {max_iterations} iterations")
+
+
+def sample_walks(graph, damping_factor, n, walkers=WALKERS, burn_in=BURN_IN, seed=None):
+    """
+    Returns the fraction of n samples spent on each page by random surfers
+    that start on uniformly random pages and then follow the transition
+    model. Up to `walkers` surfers move in lockstep, each step drawing one
+    sample per surfer once it has taken burn_in steps. There are never more
+    surfers than n // burn_in, but always at least one, so burning in costs
+    at most max(n, burn_in) surfer steps.
+    A fixed seed gives the same result every time.
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    num_pages = len(graph)
+    rng = np.random.default_rng(seed)
+    walkers = max(1, min(walkers, n // max(burn_in, 1)))
+    counts = np.zeros(num_pages, dtype=np.int64)
+
+    position = rng.integers(0, num_pages, size=walkers)
+    for _ in range(burn_in):
+        position = _walk(graph, damping_factor, position, rng)
+    remaining = n
+    while True:
+        if remaining < walkers:
+            position = position[:remaining]
+        counts += np.bincount(position, minlength=num_pages)
+        remaining -= len(position)
+        if remaining == 0:
+            break
+        position = _walk(graph, damping_factor, position, rng)
+
+    return counts / n
+
+
+def _walk(graph, damping_factor, position, rng):
+    """
+    Returns the next page of every surfer. Each follows a uniformly chosen
+    link with probability damping_factor, and otherwise, or from a page
+    without links, jumps to a uniformly chosen page.
+    """
+    follow = (rng.random(len(position)) < damping_factor) & ~graph.dangling[position]
+    link = (rng.random(len(position)) * graph.out_degree[position]).astype(np.int64)
+    next_position = rng.integers(0, len(graph), size=len(position))
+    followers = position[follow]
+    next_position[follow] = graph.targets[graph.offsets[followers] + link[follow]]
+    return next_position
@@ -0,0 +1,227 @@
+"""
+Incremental PageRank for corpora that change a little at a time.
+
+update_pagerank keeps the link graph and PageRank vector of a corpus in a
+state file inside the corpus directory. On the next run only pages whose
+file size or mtime changed, and pages that are new, are read again; their
+contents are hashed so a page that was only touched counts as unchanged.
+Links of the other pages are carried over, renumbered if pages were added
+or removed. Links to pages that were missing are remembered by name, so a
+page added later is linked to without re-reading the pages that name it.
+Power iteration then starts from the previous ranks, which after a small
+edit are already close to the new ones.
+
+Usage: python incremental.py corpus
+"""
+
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+import crawler
+from graph import LinkGraph, TOLERANCE, power_iteration
+
+STATE_NAME = "pagerank_state.npz"
+STATE_VERSION = 1
+DIGEST_SIZE = crawler.DIGEST_SIZE
+DAMPING = 0.85
+
+
+class UpdateStats():
+    """
+    What an update found and did: pages added, removed, changed (content
+    differs), unchanged, and the power iterations and time it took.
+    """
+    def __init__(self):
+        self.added = 0
+        self.removed = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.iterations = 0
+        self.seconds = 0.0
+
+    def summary(self):
+        return (f"{self.added} added, {self.removed} removed, {self.changed} changed, "
+                f"{self.unchanged} unchanged; {self.iterations} iterations in {self.seconds:.3f}s")
+
+
+def state_path(directory):
+    return os.path.join(directory, STATE_NAME)
+
+
+def load_state(path):
+    """
+    Returns the saved state as a dictionary of arrays, or None if there is
+    no state file or it was written by another version.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            state = {key: data[key] for key in data.files}
+    except (OSError, ValueError):
+        return None
+    if int(state.get("version", -1)) != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(path, graph, rank, mtimes, sizes, digests, unresolved):
+    """
+    Writes a state file. unresolved maps page numbers to the names of
+    missing pages they link to.
+    """
+    unresolved_pages = array("i")
+    unresolved_names = []
+    for page in sorted(unresolved):
+        for name in unresolved[page]:
+            unresolved_pages.append(page)
+            unresolved_names.append(name)
+    # np.savez adds .npz to names without it, so write to a name that has it
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        version=STATE_VERSION,
+        pages=np.array(graph.pages, dtype=str),
+        offsets=graph.offsets,
+        targets=graph.targets,
+        rank=rank,
+        mtimes=np.array(mtimes, dtype=np.int64),
+        sizes=np.array(sizes, dtype=np.int64),
+        digests=np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(-1, DIGEST_SIZE),
+        unresolved_pages=np.frombuffer(unresolved_pages, dtype=np.int32),
+        unresolved_names=np.array(unresolved_names, dtype=str),
+    )
+    os.replace(tmp_path, path)
+
+
+def update_pagerank(directory, damping_factor=DAMPING, tolerance=TOLERANCE, path=None,
+                    workers=None, stats=None):
+    """
+    Returns (LinkGraph, PageRank vector) of a directory of HTML pages,
+    updating the saved state of an earlier run and saving the result.
+    Without a saved state every page is crawled and ranks start uniform.
+    If an UpdateStats is given, what was done is added to it.
+    """
+    start = time.perf_counter()
+    if path is None:
+        path = state_path(directory)
+    state = load_state(path)
+    if state is None:
+        state = _empty_state()
+
+    pages = crawler.list_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    n = len(pages)
+    old_pages = state["pages"].tolist()
+    old_index = {page: j for j, page in enumerate(old_pages)}
+    # New page number of every old page, -1 for removed pages
+    old_to_new = np.array([index.get(page, -1) for page in old_pages], dtype=np.int64)
+
+    mtimes = [0] * n
+    sizes = [0] * n
+    digests = [b""] * n
+    links = [None] * n
+    unresolved = {}
+    kept = {}
+    rescan = []
+    for i, page in enumerate(pages):
+        st = os.stat(os.path.join(directory, page))
+        mtimes[i], sizes[i] = st.st_mtime_ns, st.st_size
+        j = old_index.get(page)
+        if j is not None and state["mtimes"][j] == st.st_mtime_ns and state["sizes"][j] == st.st_size:
+            kept[i] = j
+            digests[i] = state["digests"][j].tobytes()
+        else:
+            rescan.append((i, page))
+
+    added = changed = 0
+    scans = crawler.scan_pages(directory, rescan, index, workers, scan=crawler.page_details)
+    for (i, page), (size, targets, names, digest) in zip(rescan, scans):
+        sizes[i] = size
+        digests[i] = digest
+        links[i] = targets
+        if names:
+            unresolved[i] = names
+        j = old_index.get(page)
+        if j is None:
+            added += 1
+        elif state["digests"][j].tobytes() != digest:
+            changed += 1
+
+    # Carry over the links of pages that were not read again
+    old_unresolved = {}
+    for j, name in zip(state["unresolved_pages"].tolist(), state["unresolved_names"].tolist()):
+        old_unresolved.setdefault(j, []).append(name)
+    for i, j in kept.items():
+        old_targets = state["targets"][state["offsets"][j]:state["offsets"][j + 1]]
+        new_targets = old_to_new[old_targets]
+        targets = set(new_targets[new_targets >= 0].tolist())
+        names = {old_pages[target] for target in old_targets[new_targets < 0].tolist()}
+        for name in old_unresolved.get(j, ()):
+            if name in index:
+                targets.add(index[name])
+            else:
+                names.add(name)
+        targets.discard(i)
+        links[i] = array("i", sorted(targets))
+        if names:
+            unresolved[i] = sorted(names)
+
+    offsets = array("q", [0])
+    flat = array("i")
+    for targets in links:
+        flat.extend(targets)
+        offsets.append(len(flat))
+    graph = LinkGraph(pages, offsets, flat)
+
+    # Warm start from the previous ranks, with new pages at the uniform rank
+    rank = np.full(n, 1 / n) if n else np.zeros(0)
+    present = old_to_new >= 0
+    if n and present.any():
+        rank[old_to_new[present]] = state["rank"][present]
+        rank /= rank.sum()
+    residuals = []
+    rank = power_iteration(graph, damping_factor, tolerance, start=rank, residuals=residuals)
+    save_state(path, graph, rank, mtimes, sizes, digests, unresolved)
+
+    if stats is not None:
+        stats.added += added
+        stats.removed += int((~present).sum())
+        stats.changed += changed
+        stats.unchanged += n - added - changed
+        stats.iterations += len(residuals)
+        stats.seconds += time.perf_counter() - start
+    return graph, rank
+
+
+def _empty_state():
+    return {
+        "pages": np.array([], dtype=str),
+        "offsets": np.zeros(1, dtype=np.int64),
+        "targets": np.zeros(0, dtype=np.int32),
+        "rank": np.zeros(0),
+        "mtimes": np.zeros(0, dtype=np.int64),
+        "sizes": np.zeros(0, dtype=np.int64),
+        "digests": np.zeros((0, DIGEST_SIZE), dtype=np.uint8),
+        "unresolved_pages": np.zeros(0, dtype=np.int32),
+        "unresolved_names": np.array([], dtype=str),
+    }
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python incremental.py corpus")
+    stats = UpdateStats()
+    graph, rank = update_pagerank(sys.argv[1], stats=stats)
+    print(stats.summary())
+    ranks = graph.to_dict(rank)
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,32 @@
+import io
+import os
+import re
+import shutil
+import tempfile
 import unittest
+
+import numpy as np
+
+import cache
+import crawler
+import incremental
 import pagerank 
+import solvers
+from graph import LinkGraph, power_iteration, sample_walks, sparse
+
+
+def dict_pagerank(corpus, damping_factor, rounds=200):
+    """
+    Reference PageRank computed with plain dictionaries.
+    """
+    N = len(corpus)
+    PR = {page: 1 / N for page in corpus}
+    for _ in range(rounds):
+        dangling = sum(PR[page] for page in corpus if not corpus[page])
+        PR = {page: (1 - damping_factor) / N + damping_factor * (
+                  dangling / N + sum(PR[i] / len(corpus[i]) for i in corpus if page in corpus[i]))
+              for page in corpus}
+    return PR
 
 class TestPageRank(unittest.TestCase):
 
@@ -10,6 +37,288 @@ class TestPageRank(unittest.TestCase):
         result = pagerank.transition_model(corpusTest,"1.html",0.85)
         self.assertEqual(result,expectedResult)
 
+    def test_iterate_matches_dict_pagerank(self):
+        for directory in ("corpus0", "corpus1", "corpus2"):
+            corpus = pagerank.crawl(directory)
+            expected = dict_pagerank(corpus, 0.85)
+            result = pagerank.iterate_pagerank(corpus, 0.85)
+            self.assertEqual(result.keys(), expected.keys())
+            for page in corpus:
+                self.assertAlmostEqual(result[page], expected[page], places=6)
+            self.assertAlmostEqual(sum(result.values()), 1)
+
+    def test_sample_matches_iterate(self):
+        corpus = pagerank.crawl("corpus2")
+        sampled = pagerank.sample_pagerank(corpus, 0.85, 10 ** 6, seed=0)
+        iterated = pagerank.iterate_pagerank(corpus, 0.85)
+        for page in corpus:
+            self.assertAlmostEqual(sampled[page], iterated[page], delta=0.005)
+        self.assertAlmostEqual(sum(sampled.values()), 1)
+
+    def test_sample_is_reproducible(self):
+        corpus = pagerank.crawl("corpus1")
+        self.assertEqual(pagerank.sample_pagerank(corpus, 0.85, 5000, seed=7),
+                         pagerank.sample_pagerank(corpus, 0.85, 5000, seed=7))
+
+    def test_personalized_pagerank(self):
+        corpus = pagerank.crawl("corpus2")
+        uniform = pagerank.personalized_pagerank(corpus, 0.85, {page: 1 for page in corpus})
+        expected = pagerank.iterate_pagerank(corpus, 0.85)
+        for page in corpus:
+            self.assertAlmostEqual(uniform[page], expected[page], places=6)
+
+        teleports = [{"ai.html": 1}, {"python.html": 2, "c.html": 1}, {page: 1 for page in corpus}]
+        batch = pagerank.personalized_pageranks(corpus, 0.85, teleports)
+        for teleport, ranks in zip(teleports, batch):
+            single = pagerank.personalized_pagerank(corpus, 0.85, teleport)
+            for page in corpus:
+                self.assertAlmostEqual(ranks[page], single[page], places=6)
+            self.assertAlmostEqual(sum(ranks.values()), 1)
+        self.assertGreater(batch[0]["ai.html"], expected["ai.html"])
+        self.assertEqual(pagerank.personalized_pageranks(corpus, 0.85, []), [])
+
+        with self.assertRaises(ValueError):
+            pagerank.personalized_pagerank(corpus, 0.85, {"nowhere.html": 1})
+        with self.assertRaises(ValueError):
+            pagerank.personalized_pagerank(corpus, 0.85, {"ai.html": 0})
+
+    def test_dangling_pages_link_everywhere(self):
+        corpus = {"1.html": {"2.html"}, "2.html": set()}
+        result = pagerank.iterate_pagerank(corpus, 0.85)
+        # 2 gets all of 1's rank plus half its own: r1 = 0.075 + 0.425 r2
+        self.assertAlmostEqual(result["1.html"], 0.075 + 0.425 * result["2.html"])
+        self.assertAlmostEqual(sum(result.values()), 1)
+
+
+class TestLinkGraph(unittest.TestCase):
+
+    def test_from_corpus(self):
+        corpus = {"b.html": {"a.html", "b.html", "z.html"}, "a.html": set(), "c.html": {"a.html", "b.html"}}
+        graph = LinkGraph.from_corpus(corpus)
+        self.assertEqual(graph.pages, ["a.html", "b.html", "c.html"])
+        self.assertEqual(list(graph.links(graph.index["b.html"])), [0])
+        self.assertEqual(list(graph.links(graph.index["c.html"])), [0, 1])
+        self.assertEqual(graph.num_links(), 3)
+        self.assertEqual(list(graph.dangling), [True, False, False])
+
+    def test_power_iteration_tolerance(self):
+        graph = LinkGraph.from_corpus(pagerank.crawl("corpus1"))
+        loose = power_iteration(graph, 0.85, tolerance=0.01)
+        tight = power_iteration(graph, 0.85, tolerance=1e-12)
+        self.assertLess(abs(loose - tight).sum(), 0.1)
+        self.assertAlmostEqual(tight.sum(), 1)
+        with self.assertRaises(ValueError):
+            power_iteration(graph, 0.85, tolerance=0, max_iterations=5)
+
+    def test_propagate_block(self):
+        graph = LinkGraph.from_corpus(pagerank.crawl("corpus2"))
+        block = np.random.default_rng(0).random((len(graph), 3))
+        result = graph.propagate(block)
+        for k in range(3):
+            self.assertTrue(np.allclose(result[:, k], graph.propagate(block[:, k])))
+        self.assertTrue(np.allclose(graph.propagate(np.asfortranarray(block)), result))
+        with self.assertRaises(ValueError):
+            power_iteration(graph, 0.85, teleport=0.5)
+
+    @unittest.skipIf(sparse is None, "SciPy is not installed")
+    def test_sparse_matrix_path(self):
+        graph = LinkGraph.from_corpus(pagerank.crawl("corpus2"))
+        self.assertIsNotNone(graph._matrix)
+        n = len(graph)
+        dense = np.zeros((n, n))
+        np.add.at(dense, (graph.targets, graph.sources), graph.weights)
+        block = np.random.default_rng(0).random((n, 3))
+        self.assertTrue(np.allclose(graph.propagate(block), dense @ block))
+        self.assertTrue(np.allclose(graph.propagate(block[:, 0]), dense @ block[:, 0]))
+        teleport = block / block.sum(axis=0)
+        ranks = power_iteration(graph, 0.85, tolerance=1e-12, teleport=teleport)
+        for k in range(3):
+            single = power_iteration(graph, 0.85, tolerance=1e-12, teleport=teleport[:, k])
+            self.assertTrue(np.allclose(ranks[:, k], single))
+
+    def test_sample_walks_counts_every_sample(self):
+        graph = LinkGraph.from_corpus({"a.html": {"b.html"}, "b.html": set()})
+        ranks = sample_walks(graph, 0.85, 1001, walkers=100, seed=1)
+        self.assertAlmostEqual(ranks.sum(), 1)
+        self.assertEqual(list(ranks * 1001 % 1), [0, 0])
+        with self.assertRaises(ValueError):
+            sample_walks(graph, 0.85, 0)
+
+
+class TestSolvers(unittest.TestCase):
+
+    def test_methods_agree(self):
+        for directory in ("corpus0", "corpus1", "corpus2"):
+            graph = LinkGraph.from_corpus(pagerank.crawl(directory))
+            expected = power_iteration(graph, 0.85, tolerance=1e-12)
+            for method in solvers.METHODS:
+                result = solvers.solve(graph, 0.85, method)
+                self.assertEqual(result.method, method)
+                self.assertLess(abs(result.rank - expected).sum(), 1e-6)
+                self.assertAlmostEqual(result.rank.sum(), 1)
+
+    def test_diagnostics(self):
+        graph = LinkGraph.from_corpus(pagerank.crawl("corpus2"))
+        power = solvers.solve(graph, 0.85, "power")
+        self.assertEqual(power.iterations, len(power.residuals))
+        self.assertLess(power.residuals[-1], 1e-8)
+        self.assertTrue(all(r >= 1e-8 for r in power.residuals[:-1]))
+        self.assertGreater(power.seconds, 0)
+        for method in ("gauss_seidel", "extrapolation"):
+            self.assertLess(solvers.solve(graph, 0.85, method).iterations, power.iterations)
+
+    def test_personalized(self):
+        corpus = pagerank.crawl("corpus2")
+        graph = LinkGraph.from_corpus(corpus)
+        teleport = graph.teleport_distribution({"ai.html": 1, "c.html": 3})
+        expected = power_iteration(graph, 0.85, tolerance=1e-12, teleport=teleport)
+        for method in solvers.METHODS:
+            result = solvers.solve(graph, 0.85, method, teleport=teleport)
+            self.assertLess(abs(result.rank - expected).sum(), 1e-6)
+        self.assertEqual(pagerank.iterate_pagerank(corpus, 0.85, method="gauss_seidel").keys(), corpus.keys())
+
+        block = np.column_stack([teleport, graph.teleport_distribution({"python.html": 1})])
+        expected = power_iteration(graph, 0.85, tolerance=1e-12, teleport=block)
+        for method in ("power", "extrapolation"):
+            result = solvers.solve(graph, 0.85, method, teleport=block)
+            self.assertEqual(result.rank.shape, block.shape)
+            self.assertEqual(result.iterations, len(result.residuals))
+            self.assertLess(abs(result.rank - expected).sum(axis=0).max(), 1e-6)
+        with self.assertRaises(ValueError):
+            solvers.solve(graph, 0.85, "gauss_seidel", teleport=block)
+        with self.assertRaises(ValueError):
+            solvers.solve(graph, 0.85, "jacobi")
+        with self.assertRaises(ValueError):
+            solvers.solve(graph, 0.85, "gauss_seidel", tolerance=0, max_iterations=5)
+
+
+class TestCrawler(unittest.TestCase):
+
+    def test_links_split_across_chunks(self):
+        html = ('<p>x</p><a href="1.html">one</a> <a class="c" href="2.html">'
+                '<a\nhref="3.html"> <b>y</b><a href="4.html"') * 3
+        expected = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", html)
+        for chunk_size in (1, 2, 5, 7, 16, 1000):
+            self.assertEqual(list(crawler.iter_links(io.StringIO(html), chunk_size)), expected)
+
+    def test_crawl_matches_corpus(self):
+        corpus = pagerank.crawl("corpus0")
+        self.assertEqual(corpus, {"1.html": {"2.html"}, "2.html": {"1.html", "3.html"},
+                                  "3.html": {"2.html", "4.html"}, "4.html": {"2.html"}})
+
+    def test_parallel_crawl(self):
+        with tempfile.TemporaryDirectory() as directory:
+            count = crawler.PARALLEL_MIN_PAGES + 10
+            for i in range(count):
+                with open(os.path.join(directory, f"{i}.html"), "w") as f:
+                    f.write(f'<a href="{(i + 1) % count}.html">next</a> <a href="{i}.html">me</a>'
+                            f' <a href="{i * 7 % count}.html">jump</a> <a href="elsewhere.html">x</a>')
+            stats = crawler.CrawlStats()
+            parallel = crawler.crawl_graph(directory, workers=2, stats=stats)
+            serial = crawler.crawl_graph(directory, workers=1)
+            self.assertEqual(parallel.pages, serial.pages)
+            self.assertEqual(list(parallel.offsets), list(serial.offsets))
+            self.assertEqual(list(parallel.targets), list(serial.targets))
+            self.assertEqual(stats.pages, count)
+            self.assertEqual(stats.links, serial.num_links())
+            self.assertGreater(stats.pages_per_second(), 0)
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in os.listdir("corpus1"):
+            shutil.copy(os.path.join("corpus1", name), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(text)
+        # Make sure the mtime moves even on coarse clocks
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    def update(self):
+        stats = incremental.UpdateStats()
+        graph, rank = incremental.update_pagerank(self.directory, stats=stats)
+        expected = pagerank.iterate_pagerank(pagerank.crawl(self.directory), 0.85)
+        ranks = graph.to_dict(rank)
+        self.assertEqual(graph.to_corpus(), pagerank.crawl(self.directory))
+        for page in expected:
+            self.assertAlmostEqual(ranks[page], expected[page], places=6)
+        return stats
+
+    def test_updates_match_full_solve(self):
+        stats = self.update()
+        self.assertEqual((stats.added, stats.unchanged), (7, 0))
+        cold_iterations = stats.iterations
+
+        stats = self.update()
+        self.assertEqual((stats.added, stats.changed, stats.unchanged, stats.iterations), (0, 0, 7, 1))
+
+        self.write("bfs.html", '<a href="search.html">s</a> <a href="new.html">n</a>')
+        stats = self.update()
+        self.assertEqual((stats.changed, stats.unchanged), (1, 6))
+        self.assertLess(stats.iterations, cold_iterations)
+
+        # new.html is linked from bfs.html, which is not read again
+        self.write("new.html", '<a href="games.html">g</a>')
+        os.remove(os.path.join(self.directory, "dfs.html"))
+        stats = self.update()
+        self.assertEqual((stats.added, stats.removed, stats.changed), (1, 1, 0))
+
+    def test_touched_page_is_unchanged(self):
+        self.update()
+        path = os.path.join(self.directory, "games.html")
+        with open(path) as f:
+            self.write("games.html", f.read())
+        stats = self.update()
+        self.assertEqual((stats.changed, stats.unchanged), (0, 7))
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in os.listdir("corpus2"):
+            if name.endswith(".html"):
+                shutil.copy(os.path.join("corpus2", name), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cache_round_trip(self):
+        stats = crawler.CrawlStats()
+        crawled = cache.open_graph(self.directory, stats=stats)
+        self.assertEqual(stats.pages, 8)
+        self.assertTrue(os.path.exists(cache.cache_path(self.directory)))
+
+        stats = crawler.CrawlStats()
+        loaded = cache.open_graph(self.directory, stats=stats)
+        self.assertEqual(stats.pages, 0)
+        self.assertEqual(loaded.pages, crawled.pages)
+        self.assertEqual(list(loaded.offsets), list(crawled.offsets))
+        self.assertEqual(list(loaded.targets), list(crawled.targets))
+        self.assertEqual(list(loaded.out_degree), list(crawled.out_degree))
+        self.assertEqual(loaded.to_corpus(), pagerank.crawl(self.directory))
+
+    def test_cache_goes_stale(self):
+        cache.open_graph(self.directory)
+        self.assertIsNotNone(cache.load_cache(self.directory))
+        with open(os.path.join(self.directory, "extra.html"), "w") as f:
+            f.write('<a href="ai.html">ai</a>')
+        self.assertIsNone(cache.load_cache(self.directory))
+        graph = cache.open_graph(self.directory)
+        self.assertIn("extra.html", graph.index)
+        self.assertIsNotNone(cache.load_cache(self.directory))
+
+        with open(cache.cache_path(self.directory), "wb") as f:
+            f.write(b"not a cache")
+        self.assertIsNone(cache.load_cache(self.directory))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
-import os
-import random
-import re
 import sys
+import time
+
 import numpy as np
-import math
+
+from cache import open_graph
+from crawler import CrawlStats, crawl_graph
+from graph import LinkGraph, TOLERANCE, power_iteration, sample_walks
+from solvers import solve
 
 DAMPING = 0.85
 SAMPLES = 10000
@@ -12,12 +15,19 @@ SAMPLES = 10000
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    start = time.perf_counter()
+    stats = CrawlStats()
+    graph = open_graph(sys.argv[1], stats=stats)
+    if stats.pages:
+        print(stats.summary())
+    else:
+        print(f"Loaded {len(graph)} pages from the link graph cache "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    ranks = graph.to_dict(sample_walks(graph, DAMPING, SAMPLES))
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = graph.to_dict(power_iteration(graph, DAMPING))
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -28,26 +38,10 @@ def crawl(directory):
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+    Files are scanned in parallel and streamed by crawler.crawl_graph.
+    """
+    return crawl_graph(directory).to_corpus()
 
 
 def transition_model(corpus:dict, page:str, damping_factor:float) -> dict:
@@ -82,7 +76,7 @@ def transition_model(corpus:dict, page:str, damping_factor:float) -> dict:
 
 
 
-def sample_pagerank(corpus:dict, damping_factor:float, n:int) -> dict:
+def sample_pagerank(corpus:dict, damping_factor:float, n:int, seed=None) -> dict:
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -90,28 +84,14 @@ def sample_pagerank(corpus:dict, damping_factor:float, n:int) -> dict:
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    Many random surfers are advanced together as NumPy arrays over a
+    LinkGraph of the corpus; pass a seed for reproducible samples.
     """
-    num_samples_left = n
-    page_rank_values = {page : 0 for page in corpus}
-
-    previous_sample = random.choice(list(corpus.keys()))
-    page_rank_values[previous_sample] += 1
-    num_samples_left -= 1
-
-    while(num_samples_left > 0):
-        pages, probs = zip(*transition_model(corpus,previous_sample,damping_factor).items())
-        next_page = np.random.choice(pages, p=probs)
-        page_rank_values[next_page] += 1
-        num_samples_left -= 1
-        previous_sample = next_page
-    
-    #Normalize dictionary
-    for key in page_rank_values:
-        page_rank_values[key] /= n
-    
-    return page_rank_values
-
-def iterate_pagerank(corpus:dict, damping_factor:float) -> dict: 
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(sample_walks(graph, damping_factor, n, seed=seed))
+
+def iterate_pagerank(corpus:dict, damping_factor:float, tolerance:float=TOLERANCE, method:str="power") -> dict:
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -119,43 +99,36 @@ def iterate_pagerank(corpus:dict, damping_factor:float) -> dict:
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The corpus is converted to a sparse LinkGraph and iterated with
+    NumPy until the ranks change by less than `tolerance` in L1 norm,
+    using a solver of solvers.METHODS. Pages without links are treated
+    as linking to every page.
     """
-    num_total_pages = len(corpus)
-    PR = {page : 1/num_total_pages for page in corpus}
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(solve(graph, damping_factor, method, tolerance).rank)
 
-    #Corpus goes: page links to these others pages
-    #i in the formula means all pages that link to this page
-    each_possible_page_that_links_to_p = {page : [] for page in corpus}
-    for page in corpus.keys():
-        for linkedPage in corpus.keys():
-            if page != linkedPage and page in corpus[linkedPage]:
-                each_possible_page_that_links_to_p[page].append(linkedPage)
-
-    threshhold = 0.001
-    while(True):
-        max_change = -math.inf
-        for page in corpus.keys():
-            old_PR_val = PR[page]
-            new_PR_val = (1-damping_factor)/num_total_pages
-
-            iterating_sum = 0
-            for i in each_possible_page_that_links_to_p[page]:
-                num_links_on_page_i = len(corpus[i])
-
-                if num_links_on_page_i == 0:
-                    iterating_sum += (PR[i]/num_total_pages)
-                else:
-                    iterating_sum += (PR[i]/num_links_on_page_i)
-            
-            new_PR_val += (damping_factor * iterating_sum)
-            PR[page] = new_PR_val
-            max_change = max(max_change,abs(PR[page]-old_PR_val))
-        
-        if(max_change < threshhold): 
-            break
-        
 
-    return PR
+def personalized_pagerank(corpus:dict, damping_factor:float, teleport:dict, tolerance:float=TOLERANCE) -> dict:
+    """
+    Return PageRank values for each page when the random surfer jumps
+    to pages in proportion to `teleport`, a dictionary of non-negative
+    weights for some of the pages, instead of uniformly.
+    """
+    return personalized_pageranks(corpus, damping_factor, [teleport], tolerance)[0]
+
+
+def personalized_pageranks(corpus:dict, damping_factor:float, teleports:list, tolerance:float=TOLERANCE) -> list:
+    """
+    Return a PageRank dictionary for every teleport dictionary in
+    `teleports`, all solved together in one batched power iteration.
+    """
+    if not teleports:
+        return []
+    graph = LinkGraph.from_corpus(corpus)
+    block = np.column_stack([graph.teleport_distribution(teleport) for teleport in teleports])
+    ranks = power_iteration(graph, damping_factor, tolerance, teleport=block)
+    return [graph.to_dict(ranks[:, k]) for k in range(len(teleports))]
 
 
 if __name__ == "__main__":
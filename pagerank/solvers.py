@@ -0,0 +1,180 @@
+"""
+PageRank solvers with convergence diagnostics.
+
+solve(graph, damping_factor, method) runs one of METHODS and returns a
+SolveResult with the ranks, the number of iterations, the L1 change of
+every iteration and the time taken:
+
+    "power"          power iteration (graph.power_iteration)
+    "gauss_seidel"   block Gauss-Seidel: pages are updated a block at a
+                     time, each block already using the new ranks of the
+                     blocks before it
+    "extrapolation"  power iteration with quadratic extrapolation every
+                     EXTRAPOLATE_EVERY iterations (Kamvar et al., 2003)
+
+All of them stop once an iteration changes the ranks by less than
+tolerance in L1 norm, and accept a teleport distribution for personalized
+PageRank. "power" and "extrapolation" also accept an n x K block of them,
+as power_iteration does, and then report the largest change of any column.
+"""
+
+import time
+
+import numpy as np
+
+from graph import MAX_ITERATIONS, TOLERANCE, power_iteration
+
+METHODS = ("power", "gauss_seidel", "extrapolation")
+
+# Gauss-Seidel updates pages in this many blocks per sweep
+GAUSS_SEIDEL_BLOCKS = 64
+
+EXTRAPOLATE_EVERY = 10
+
+
+class SolveResult():
+    """
+    Ranks found by a solver and how it got there.
+
+        rank        PageRank vector
+        method      name of the solver
+        iterations  iterations (or sweeps) run
+        residuals   L1 change of the ranks at every iteration
+        seconds     wall time
+    """
+    def __init__(self, rank, method, residuals, seconds):
+        self.rank = rank
+        self.method = method
+        self.residuals = residuals
+        self.iterations = len(residuals)
+        self.seconds = seconds
+
+
+def solve(graph, damping_factor, method="power", tolerance=TOLERANCE,
+          max_iterations=MAX_ITERATIONS, teleport=None):
+    """
+    Returns the SolveResult of computing a LinkGraph's PageRank with a
+    method of METHODS. Raises ValueError if it does not converge within
+    max_iterations iterations.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown PageRank method {method!r}")
+    if teleport is not None:
+        teleport = np.asarray(teleport, dtype=np.float64)
+        if teleport.ndim not in (1, 2) or teleport.shape[0] != len(graph):
+            raise ValueError("teleport must have one row per page")
+        if teleport.ndim == 2 and method == "gauss_seidel":
+            raise ValueError("gauss_seidel solves one teleport distribution at a time")
+    start = time.perf_counter()
+    residuals = []
+    if method == "power":
+        rank = power_iteration(graph, damping_factor, tolerance, max_iterations,
+                               residuals=residuals, teleport=teleport)
+    elif method == "gauss_seidel":
+        rank = gauss_seidel(graph, damping_factor, tolerance, max_iterations, residuals, teleport)
+    else:
+        rank = extrapolated_power_iteration(graph, damping_factor, tolerance, max_iterations,
+                                            residuals, teleport)
+    return SolveResult(rank, method, residuals, time.perf_counter() - start)
+
+
+def gauss_seidel(graph, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                 residuals=None, teleport=None):
+    """
+    Returns the PageRank vector of a LinkGraph by block Gauss-Seidel sweeps
+    over the linear system (I - damping * P) rank = (1 - damping) * v,
+    where P includes the jumps from dangling pages.
+    """
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0)
+    v = np.full(n, 1 / n) if teleport is None else teleport
+    rank = v.copy()
+
+    # Links grouped by target page, so a block of pages reads its inbound links as one slice
+    order = np.argsort(graph.targets, kind="stable")
+    in_targets = graph.targets[order]
+    in_sources = graph.sources[order]
+    in_weights = graph.weights[order]
+    in_offsets = np.searchsorted(in_targets, np.arange(n + 1))
+    dangling = graph.dangling
+    # A dangling page jumps to itself too, which puts it on the diagonal
+    diagonal = 1 - damping_factor * v * dangling
+
+    block = max(1, -(-n // GAUSS_SEIDEL_BLOCKS))
+    for _ in range(max_iterations):
+        previous = rank.copy()
+        dangling_mass = rank[dangling].sum()
+        for first in range(0, n, block):
+            last = min(first + block, n)
+            links = slice(in_offsets[first], in_offsets[last])
+            received = np.bincount(in_targets[links] - first,
+                                   weights=rank[in_sources[links]] * in_weights[links],
+                                   minlength=last - first)
+            pages = slice(first, last)
+            # Dangling mass from every other page, the page itself being on the diagonal
+            others = dangling_mass - rank[pages] * dangling[pages]
+            new = (damping_factor * (received + others * v[pages])
+                   + (1 - damping_factor) * v[pages]) / diagonal[pages]
+            dangling_mass += ((new - rank[pages]) * dangling[pages]).sum()
+            rank[pages] = new
+        # The solution sums to 1; rescaling each sweep removes the slowest error term
+        rank /= rank.sum()
+        change = np.abs(rank - previous).sum()
+        if residuals is not None:
+            residuals.append(float(change))
+        if change < tolerance:
+            return rank
+    raise ValueError(f"PageRank did not converge within {max_iterations} iterations")
+
+
+def extrapolated_power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS, residuals=None, teleport=None):
+    """
+    Returns the PageRank vector of a LinkGraph by power iteration, every
+    EXTRAPOLATE_EVERY iterations replacing the ranks with a quadratic
+    extrapolation from the last four, which cancels the slowest decaying
+    error terms. An n x K teleport block is extrapolated column by column.
+    """
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0) if teleport is None else np.zeros(teleport.shape)
+    rank = np.full(n, 1 / n) if teleport is None else teleport.copy()
+    history = [rank]
+    for iteration in range(1, max_iterations + 1):
+        new_rank = graph.step(rank, damping_factor, teleport)
+        change = np.abs(new_rank - rank).sum(axis=0).max()
+        rank = new_rank
+        if residuals is not None:
+            residuals.append(float(change))
+        if change < tolerance:
+            return rank
+        history = history[-3:] + [rank]
+        if iteration % EXTRAPOLATE_EVERY == 0 and len(history) == 4:
+            if rank.ndim == 1:
+                rank = quadratic_extrapolation(*history)
+            else:
+                rank = np.column_stack([quadratic_extrapolation(*(x[:, k] for x in history))
+                                        for k in range(rank.shape[1])])
+            history = [rank]
+    raise ValueError(f"PageRank did not converge within {max_iterations} iterations")
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Returns the quadratic extrapolation of four successive iterates,
+    as a probability distribution.
+    """
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma1, gamma2 = np.linalg.lstsq(y, -(x3 - x0), rcond=None)[0]
+    gamma3 = 1.0
+    beta0 = gamma1 + gamma2 + gamma3
+    beta1 = gamma2 + gamma3
+    beta2 = gamma3
+    extrapolated = beta0 * x1 + beta1 * x2 + beta2 * x3
+    extrapolated = np.maximum(extrapolated, 0)
+    total = extrapolated.sum()
+    # Fall back on the last iterate if the extrapolation degenerates
+    if not np.isfinite(total) or total <= 0:
+        return x3
+    return extrapolated / total
@@ -0,0 +1,114 @@
+"""
+Batch position analysis
+
+evaluate_positions takes any number of 3x3 positions, as list-of-lists
+boards or bitboard.encode integers, and streams back (value, move) for each
+one in order. Positions are solved once per symmetry class with the bitboard
+engine and its shared transposition table, so a batch never costs more than
+the few hundred distinct classes there are, and memory stays constant however
+long the input is.
+
+Usage: python analysis.py [file]
+    Reads one position per line, either an encoded integer or 9 cells of
+    X, O and . read row by row, and prints "value i j" (or "value -" once
+    the game is over) for each.
+"""
+
+import sys
+import time
+
+import bitboard
+import solution_table
+from tictactoe import X, O, EMPTY
+
+
+class PositionCache():
+    """
+    Maps canonical positions to (value, move index in the canonical frame).
+    Shared by every position of a batch; its size is bounded by the number
+    of symmetry classes.
+    """
+    def __init__(self):
+        self.solutions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, x, o, stats=None):
+        """
+        Returns (value, action) for a position, with action None if the game is over.
+        """
+        if bitboard.terminal(x, o):
+            return bitboard.utility(x, o), None
+        key = bitboard.canonical(x, o)
+        if key in self.solutions:
+            self.hits += 1
+        else:
+            self.misses += 1
+            canonical_x, canonical_o = bitboard.decode(key)
+            self.solutions[key] = bitboard.root_search(
+                canonical_x, canonical_o, bitboard.moves(canonical_x, canonical_o), stats)
+        value, move = solution_table.lookup(x, o, self.solutions)
+        return value, divmod(move, 3)
+
+
+def to_bitboards(position):
+    """
+    Returns the (x, o) bitboards of a list-of-lists board or an encoded integer.
+    """
+    if isinstance(position, int):
+        if not 0 <= position < 1 << 18:
+            raise ValueError(f"Encoded position {position} is out of range")
+        x, o = bitboard.decode(position)
+    else:
+        if len(position) != 3 or any(len(row) != 3 for row in position):
+            raise ValueError("Only 3x3 boards can be analysed")
+        x, o = bitboard.from_board(position)
+    if x & o:
+        raise ValueError("A cell is marked by both players")
+    # X moves first, so X has as many marks as O or one more
+    if bitboard.POPCOUNT[x] - bitboard.POPCOUNT[o] not in (0, 1):
+        raise ValueError("X must have as many marks as O or one more")
+    return x, o
+
+
+def evaluate_positions(positions, stats=None, cache=None):
+    """
+    Yields (value, action) for every position in order: the minimax value
+    (1 if X wins, -1 if O wins, 0 for a draw) and an optimal action (i, j),
+    or None for finished games. Pass a PositionCache to share solutions
+    between batches.
+    """
+    if cache is None:
+        cache = PositionCache()
+    for position in positions:
+        start = time.perf_counter()
+        x, o = to_bitboards(position)
+        solution = cache.solve(x, o, stats)
+        if stats is not None:
+            stats.seconds += time.perf_counter() - start
+        yield solution
+
+
+def parse_position(line):
+    line = line.strip()
+    if line.isdigit():
+        return int(line)
+    cells = line.replace(" ", "")
+    if len(cells) != 9 or any(cell not in "XO." for cell in cells.upper()):
+        raise ValueError(f"Cannot read position {line!r}")
+    marks = {"X": X, "O": O, ".": EMPTY}
+    return [[marks[cell] for cell in cells.upper()[i:i + 3]] for i in range(0, 9, 3)]
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python analysis.py [file]")
+    f = open(sys.argv[1]) if len(sys.argv) == 2 else sys.stdin
+    with f:
+        positions = (parse_position(line) for line in f if line.strip())
+        for value, action in evaluate_positions(positions):
+            print(value, "-" if action is None else f"{action[0]} {action[1]}")
+
+
+if __name__ == "__main__":
+    main()
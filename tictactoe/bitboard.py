@@ -0,0 +1,249 @@
+"""
+Bitboard Tic Tac Toe engine
+
+A position is a pair of 9-bit integers (x, o): bit i * 3 + j is set when
+X (or O) has played cell (i, j). Moves are a bitwise or, wins are mask
+comparisons and whose turn it is comes from a popcount table, so nothing
+is allocated or rescanned while searching. from_board / to_board convert
+to and from the list-of-lists boards used by tictactoe.py and runner.py.
+"""
+
+import math
+import time
+
+from tictactoe import X, O, EMPTY, SYMMETRIES, actions
+
+FULL = 0b111111111
+
+# Rows, columns and diagonals as bitmasks
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+POPCOUNT = tuple(bin(bits).count("1") for bits in range(1 << 9))
+
+# For every symmetry, maps a 9-bit board to its image, so a board's
+# canonical form is a table lookup per symmetry
+SYMMETRY_TABLES = tuple(
+    tuple(
+        sum(1 << k for k in range(9) if bits >> symmetry[k] & 1)
+        for bits in range(1 << 9)
+    )
+    for symmetry in SYMMETRIES
+)
+
+# Transposition table flags, as in tictactoe.py
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Maps canonical encoded positions to (value, flag), shared across calls
+transposition_table = {}
+
+
+def from_board(board):
+    """
+    Returns the (x, o) bitboards of a list-of-lists board.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (i * 3 + j)
+            elif board[i][j] == O:
+                o |= 1 << (i * 3 + j)
+    return x, o
+
+
+def to_board(x, o):
+    """
+    Returns the list-of-lists board of (x, o) bitboards.
+    """
+    board = []
+    for i in range(3):
+        row = []
+        for j in range(3):
+            bit = 1 << (i * 3 + j)
+            row.append(X if x & bit else O if o & bit else EMPTY)
+        board.append(row)
+    return board
+
+
+def encode(x, o):
+    """
+    Packs a position into one 18-bit integer.
+    """
+    return x | o << 9
+
+
+def decode(code):
+    return code & FULL, code >> 9
+
+
+def canonical(x, o):
+    """
+    Returns the smallest encoding of the position over all 8 symmetries.
+    """
+    return min(table[x] | table[o] << 9 for table in SYMMETRY_TABLES)
+
+
+def is_win(bits):
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def winner(x, o):
+    if is_win(x):
+        return X
+    if is_win(o):
+        return O
+    return None
+
+
+def terminal(x, o):
+    return (x | o) == FULL or is_win(x) or is_win(o)
+
+
+def utility(x, o):
+    if is_win(x):
+        return 1
+    if is_win(o):
+        return -1
+    return 0
+
+
+def player(x, o):
+    """
+    Returns the player to move, or EMPTY if the game is over.
+    """
+    if terminal(x, o):
+        return EMPTY
+    return X if POPCOUNT[x] == POPCOUNT[o] else O
+
+
+def moves(x, o):
+    """
+    Returns the empty cell indices of a position.
+    """
+    empty = ~(x | o) & FULL
+    return [k for k in range(9) if empty >> k & 1]
+
+
+def alphabeta(x, o, x_to_move, alpha, beta, stats=None, ply=0):
+    """
+    Returns the minimax value of a position with the same window
+    semantics as tictactoe.alphabeta.
+    """
+    if stats is not None:
+        stats.visit(ply)
+
+    if is_win(x):
+        return 1
+    if is_win(o):
+        return -1
+    occupied = x | o
+    if occupied == FULL:
+        return 0
+
+    key = canonical(x, o)
+    entry = transposition_table.get(key)
+    if entry is not None:
+        value, flag = entry
+        if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+            if stats is not None:
+                stats.cache_hits += 1
+            return value
+
+    original_alpha, original_beta = alpha, beta
+    if x_to_move:
+        best = -math.inf
+        for k in range(9):
+            bit = 1 << k
+            if occupied & bit:
+                continue
+            best = max(best, alphabeta(x | bit, o, False, alpha, beta, stats, ply + 1))
+            alpha = max(alpha, best)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+    else:
+        best = math.inf
+        for k in range(9):
+            bit = 1 << k
+            if occupied & bit:
+                continue
+            best = min(best, alphabeta(x, o | bit, True, alpha, beta, stats, ply + 1))
+            beta = min(beta, best)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+
+    if best <= original_alpha:
+        flag = UPPER
+    elif best >= original_beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table[key] = (best, flag)
+    return best
+
+
+def root_search(x, o, cells, stats=None):
+    """
+    Returns (value, best cell index) of a non-terminal position, trying the
+    cell indices in the order given and keeping the first of equally good
+    moves. Time spent on each move is added to stats as its root action.
+    """
+    # Values are -1, 0 or 1, so the window never needs to be wider
+    alpha, beta = -1, 1
+    best_move = None
+    if player(x, o) == X:
+        best_value = -math.inf
+        for k in cells:
+            if stats is not None:
+                action_start = time.perf_counter()
+            value = alphabeta(x | 1 << k, o, False, max(alpha, best_value), beta, stats, 1)
+            if stats is not None:
+                stats.time_root(divmod(k, 3), action_start)
+            if value > best_value:
+                best_value, best_move = value, k
+                if best_value >= beta:
+                    break
+    else:
+        best_value = math.inf
+        for k in cells:
+            if stats is not None:
+                action_start = time.perf_counter()
+            value = alphabeta(x, o | 1 << k, True, alpha, min(beta, best_value), stats, 1)
+            if stats is not None:
+                stats.time_root(divmod(k, 3), action_start)
+            if value < best_value:
+                best_value, best_move = value, k
+                if best_value <= alpha:
+                    break
+    return best_value, best_move
+
+
+def minimax(board, stats=None):
+    """
+    Returns the optimal action (i, j) for the current player on a
+    list-of-lists board, choosing the same move as tictactoe.minimax.
+    """
+    start = time.perf_counter()
+    x, o = from_board(board)
+    if player(x, o) is EMPTY:
+        return None
+
+    # Root moves in the order tictactoe.minimax tries them, so ties between
+    # equally good moves are broken the same way
+    _, move = root_search(x, o, [i * 3 + j for i, j in actions(board)], stats)
+
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
+    return divmod(move, 3)
@@ -0,0 +1,173 @@
+"""
+Parallel root split search
+
+The root moves of a fixed depth search are shared out across a pool of
+worker processes. Every worker reads the best value found so far from a
+shared bound before it starts a move and searches with a window just below
+it, so moves that cannot beat the best are cut off early, wherever they run.
+
+The chosen move does not depend on the number of workers or on the order
+they finish in: a move whose value ties or beats the bound is always
+searched exactly, and ties go to the move that comes first in the root
+order. The root order is centre first, or shuffled by `seed` when one is
+given, so a fixed seed always gives the same move.
+
+Usage: python parallel.py [--rows R] [--cols C] [--k K] [--depth D]
+                          [--workers N] [--seed S]
+    Times the search of an empty board with 1 to N workers.
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from tictactoe import (EMPTY, X, SearchStats, default_k, initial_state, line_heuristic,
+                       ordered_moves, player, root_move_value)
+
+# Bound margin, so a move worth exactly the best value is still searched
+# exactly and ties are broken by root order instead of by finishing order
+EPSILON = 1e-9
+
+# Search state of a worker process, set by _init_worker
+_search = None
+_bound = None
+
+
+def _init_worker(search, bound):
+    global _search, _bound
+    _search = search
+    _bound = bound
+
+
+def _search_move(index):
+    """
+    Searches root move index against the shared bound.
+    Returns (index, value, exact, SearchStats).
+    """
+    board, k, depth, moves, maximizing, evaluate = _search
+    # Values are kept from the mover's point of view in the bound
+    floor = _bound.value - EPSILON
+    if maximizing:
+        alpha, beta = floor, math.inf
+    else:
+        alpha, beta = -math.inf, -floor
+
+    stats = SearchStats()
+    start = time.perf_counter()
+    remaining = moves[:index] + moves[index + 1:]
+    value = root_move_value(board, k, depth, moves[index], maximizing, remaining,
+                            evaluate, alpha, beta, None, stats)
+    stats.time_root(moves[index], start)
+    score = value if maximizing else -value
+    exact = score > floor
+    if exact:
+        with _bound.get_lock():
+            if score > _bound.value:
+                _bound.value = score
+    return index, value, exact, stats
+
+
+def root_order(board, seed=None):
+    """
+    Returns the root moves in the order they are searched and tie-broken.
+    """
+    moves = ordered_moves(board)
+    if seed is not None:
+        random.Random(seed).shuffle(moves)
+    return moves
+
+
+def parallel_search(board, k=None, depth=None, workers=None, seed=None, evaluate=None, stats=None):
+    """
+    Returns the best action for the current player on a board of any size,
+    searching every root move depth moves deep (the whole game by default)
+    across `workers` processes (one per CPU by default).
+
+    The first root move is searched on its own so that the others start
+    with a bound to prune against.
+    """
+    if k is None:
+        k = default_k(board)
+    if evaluate is None:
+        evaluate = line_heuristic
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    start = time.perf_counter()
+
+    currentPlayer = player(board, k)
+    if currentPlayer is EMPTY:
+        return None
+    maximizing = currentPlayer == X
+
+    moves = root_order(board, seed)
+    if depth is None or depth > len(moves):
+        depth = len(moves)
+    if depth < 1:
+        raise ValueError("depth must be at least 1")
+
+    search = ([row[:] for row in board], k, depth, moves, maximizing, evaluate)
+    bound = multiprocessing.Value("d", -math.inf)
+    _init_worker(search, bound)
+    results = [_search_move(0)]
+    if len(moves) > 1:
+        if workers == 1:
+            results.extend(_search_move(index) for index in range(1, len(moves)))
+        else:
+            # Forked workers inherit the search, so evaluate need not pickle
+            context = multiprocessing.get_context("fork")
+            with context.Pool(min(workers, len(moves) - 1), _init_worker, (search, bound)) as pool:
+                results.extend(pool.imap_unordered(_search_move, range(1, len(moves))))
+    _init_worker(None, None)
+
+    best_index = best_score = None
+    for index, value, exact, move_stats in results:
+        if stats is not None:
+            stats.merge(move_stats)
+        score = value if maximizing else -value
+        if exact and (best_score is None or score > best_score
+                      or (score == best_score and index < best_index)):
+            best_index, best_score = index, score
+
+    if stats is not None:
+        stats.depth = depth
+        stats.seconds += time.perf_counter() - start
+    return moves[best_index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the parallel root split.")
+    parser.add_argument("--rows", type=int, default=4)
+    parser.add_argument("--cols", type=int, default=4)
+    parser.add_argument("--k", type=int, default=None)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="largest number of workers to time")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    board = initial_state(args.rows, args.cols)
+    print(f"{args.rows}x{args.cols} board, {args.k or default_k(board)} in a row, depth {args.depth}")
+    print(f"{'workers':>7} {'seconds':>9} {'speedup':>8} {'nodes':>10}  move")
+    baseline = None
+    chosen = set()
+    for workers in range(1, args.workers + 1):
+        stats = SearchStats()
+        action = parallel_search(board, args.k, args.depth, workers, args.seed, stats=stats)
+        chosen.add(action)
+        if baseline is None:
+            baseline = stats.seconds
+        print(f"{workers:>7} {stats.seconds:>9.3f} {baseline / stats.seconds:>7.2f}x "
+              f"{stats.nodes:>10}  {action}")
+
+    if len(chosen) != 1:
+        sys.exit("The chosen move depends on the number of workers.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
+import argparse
 import pygame
 import sys
 import time
 
 import tictactoe as ttt
 
+parser = argparse.ArgumentParser(description="Play Tic-Tac-Toe against the computer.")
+parser.add_argument("--mode", choices=ttt.MODES, default="table", help="how the computer searches")
+parser.add_argument("--stats", action="store_true", help="show search stats under the board")
+args = parser.parse_args()
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -16,10 +22,12 @@ screen = pygame.display.set_mode(size)
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+statsFont = pygame.font.Font("OpenSans-Regular.ttf", 14)
 
 user = None
 board = ttt.initial_state()
 ai_turn = False
+stats_lines = []
 
 while True:
 
@@ -112,12 +120,23 @@ while True:
         if user != player and not game_over:
             if ai_turn:
                 time.sleep(0.5)
-                move = ttt.minimax(board)
+                stats = ttt.SearchStats() if args.stats else None
+                move = ttt.minimax(board, stats, mode=args.mode)
+                if stats is not None:
+                    stats_lines = [f"AI played {move}"] + stats.summary()
                 board = ttt.result(board, move)
                 ai_turn = False
             else:
                 ai_turn = True
 
+        # Show search stats under the board, where Play Again goes at the end
+        if stats_lines and not game_over:
+            for n, line in enumerate(stats_lines):
+                text = statsFont.render(line, True, white)
+                textRect = text.get_rect()
+                textRect.center = ((width / 2), tile_origin[1] + 3 * tile_size + 12 + n * 16)
+                screen.blit(text, textRect)
+
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
@@ -142,5 +161,6 @@ while True:
                     user = None
                     board = ttt.initial_state()
                     ai_turn = False
+                    stats_lines = []
 
     pygame.display.flip()
@@ -0,0 +1,144 @@
+"""
+Precomputed Tic Tac Toe solutions
+
+Every reachable non-terminal position is solved once, offline, and only one
+position per symmetry class is kept, so the whole game fits in a few
+kilobytes. minimax(board, mode="table") then answers with a dictionary
+lookup. The table is read lazily on first use; if solutions.bin is missing
+it is solved in memory instead.
+
+Each entry is a 32-bit little endian integer:
+    bits 8..25  canonical position, bitboard.encode(x, o)
+    bits 4..7   minimax value + 1 (0, 1 or 2)
+    bits 0..3   best move as cell index i * 3 + j in the canonical frame
+
+Usage: python solution_table.py [output]
+"""
+
+import os
+import sys
+from array import array
+
+import bitboard
+from tictactoe import X, EMPTY
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solutions.bin")
+
+# Maps canonical positions to (value, move index), loaded on first lookup
+solutions = None
+
+
+def reachable_positions():
+    """
+    Returns the set of canonical encodings of every reachable non-terminal
+    position.
+    """
+    positions = set()
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        if bitboard.terminal(x, o):
+            continue
+        key = bitboard.canonical(x, o)
+        if key in positions:
+            continue
+        positions.add(key)
+        x_to_move = bitboard.POPCOUNT[x] == bitboard.POPCOUNT[o]
+        for k in bitboard.moves(x, o):
+            if x_to_move:
+                stack.append((x | 1 << k, o))
+            else:
+                stack.append((x, o | 1 << k))
+    return positions
+
+
+def solve():
+    """
+    Solves every reachable position. Returns a dictionary mapping
+    canonical positions to (value, move index).
+    """
+    table = {}
+    for key in reachable_positions():
+        x, o = bitboard.decode(key)
+        i, j = bitboard.minimax(bitboard.to_board(x, o))
+        k = i * 3 + j
+        if bitboard.player(x, o) == X:
+            value = bitboard.alphabeta(x | 1 << k, o, False, -1, 1)
+        else:
+            value = bitboard.alphabeta(x, o | 1 << k, True, -1, 1)
+        table[key] = (value, k)
+    return table
+
+
+def write_table(table, path=TABLE_PATH):
+    entries = array("I", sorted(
+        key << 8 | (value + 1) << 4 | move for key, (value, move) in table.items()
+    ))
+    if sys.byteorder != "little":
+        entries.byteswap()
+    with open(path, "wb") as f:
+        entries.tofile(f)
+
+
+def read_table(path=TABLE_PATH):
+    entries = array("I")
+    with open(path, "rb") as f:
+        entries.frombytes(f.read())
+    if sys.byteorder != "little":
+        entries.byteswap()
+    return {entry >> 8: ((entry >> 4 & 0xF) - 1, entry & 0xF) for entry in entries}
+
+
+def load():
+    """
+    Returns the solutions, reading or solving them on first use.
+    """
+    global solutions
+    if solutions is None:
+        if os.path.exists(TABLE_PATH):
+            solutions = read_table(TABLE_PATH)
+        else:
+            solutions = solve()
+    return solutions
+
+
+def lookup(x, o, table=None):
+    """
+    Returns (value, move index) for a non-terminal position,
+    with the move mapped back from the canonical frame. Looks the position
+    up in a table of canonical positions, by default the solutions.
+    """
+    if table is None:
+        table = load()
+    for symmetry, symmetry_table in zip(bitboard.SYMMETRIES, bitboard.SYMMETRY_TABLES):
+        key = symmetry_table[x] | symmetry_table[o] << 9
+        if key in table:
+            value, move = table[key]
+            # Cell k of the canonical board is cell symmetry[k] of this one
+            return value, symmetry[move]
+    raise ValueError("Position is not reachable")
+
+
+def best_move(board):
+    """
+    Returns the optimal action (i, j) on a list-of-lists board,
+    or None if the game is over.
+    """
+    x, o = bitboard.from_board(board)
+    if bitboard.player(x, o) is EMPTY:
+        return None
+    _, move = lookup(x, o)
+    return divmod(move, 3)
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python solution_table.py [output]")
+    path = sys.argv[1] if len(sys.argv) == 2 else TABLE_PATH
+    table = solve()
+    write_table(table, path)
+    print(f"Solved {len(table)} positions into {path} ({os.path.getsize(path)} bytes).")
+
+
+if __name__ == "__main__":
+    main()
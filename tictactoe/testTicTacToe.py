@@ -1,6 +1,10 @@
 import unittest
 
+import analysis
+import bitboard
+import solution_table
 import tictactoe
+import tournament
 from tictactoe import initial_state, X, EMPTY, O
 
 class TestTicTacToe(unittest.TestCase):
@@ -85,6 +89,16 @@ class TestTicTacToe(unittest.TestCase):
         result = tictactoe.winner(initial_state())
         self.assertEqual(result,None)
 
+        result = tictactoe.winner([[EMPTY,EMPTY,EMPTY],
+                                   [X,X,X],
+                                   [O,O,EMPTY]])
+        self.assertEqual(result,X)
+
+        result = tictactoe.winner([[EMPTY,X,O],
+                                   [EMPTY,X,O],
+                                   [X,EMPTY,O]])
+        self.assertEqual(result,O)
+
     def test_terminal(self):
 
         result = tictactoe.terminal([[X,O,X],
@@ -179,7 +193,297 @@ class TestTicTacToe(unittest.TestCase):
                                     [O,X,X],
                                     [X,O,X]])
         self.assertEqual(result,None)
+
+    def test_canonical_key_is_symmetric(self):
+        board = [[X,O,EMPTY],
+                 [EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY]]
+        rotated = [[EMPTY,EMPTY,X],
+                   [EMPTY,EMPTY,O],
+                   [EMPTY,EMPTY,EMPTY]]
+        mirrored = [[EMPTY,O,X],
+                    [EMPTY,EMPTY,EMPTY],
+                    [EMPTY,EMPTY,EMPTY]]
+        self.assertEqual(tictactoe.canonical_key(board), tictactoe.canonical_key(rotated))
+        self.assertEqual(tictactoe.canonical_key(board), tictactoe.canonical_key(mirrored))
+        self.assertNotEqual(tictactoe.canonical_key(board), tictactoe.canonical_key(initial_state()))
+
+    def test_minimax_reports_stats_and_reuses_table(self):
+        tictactoe.reset_transposition_table()
+        cold = tictactoe.SearchStats()
+        tictactoe.minimax(initial_state(), cold)
+        self.assertGreater(cold.nodes, 0)
+        self.assertGreater(cold.seconds, 0)
+
+        warm = tictactoe.SearchStats()
+        tictactoe.minimax(initial_state(), warm)
+        self.assertLess(warm.nodes, cold.nodes)
+
+    def test_alphabeta_values(self):
+        tictactoe.reset_transposition_table()
+        self.assertEqual(tictactoe.alphabeta(initial_state(), -1, 1), 0)
+        self.assertEqual(tictactoe.alphabeta([[X,X,EMPTY],
+                                              [O,O,EMPTY],
+                                              [EMPTY,EMPTY,EMPTY]], -1, 1), 1)
+
+    def test_plain_minimax(self):
+        board = [[X,O,EMPTY],
+                 [EMPTY,X,EMPTY],
+                 [EMPTY,EMPTY,O]]
+        move = tictactoe.minimax(board, mode="plain")
+        self.assertEqual(tictactoe.minimax_value(tictactoe.result(board, move)),
+                         tictactoe.minimax_value(board))
         
+
+
+class TestGeneralBoards(unittest.TestCase):
+
+    def test_initial_state_and_actions(self):
+        board = initial_state(4, 5)
+        self.assertEqual(len(board), 4)
+        self.assertEqual(len(board[0]), 5)
+        self.assertEqual(len(tictactoe.actions(board)), 20)
+        self.assertEqual(initial_state(), [[EMPTY] * 3 for _ in range(3)])
+
+    def test_k_in_a_row(self):
+        board = initial_state(5, 5)
+        for step in range(4):
+            board[step + 1][3 - step] = O
+        self.assertEqual(tictactoe.winner(board, 4), O)
+        self.assertIsNone(tictactoe.winner(board))
+        self.assertTrue(tictactoe.terminal(board, 4))
+        self.assertEqual(tictactoe.utility(board, 4), -1)
+        self.assertTrue(tictactoe.wins_through(board, 2, 2, 4))
+        self.assertFalse(tictactoe.wins_through(board, 2, 2, 5))
+
+    def test_deepening_takes_and_blocks_wins(self):
+        board = [[X,X,X,EMPTY],
+                 [O,O,O,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY]]
+        self.assertEqual(tictactoe.minimax(board, mode="deepening", time_budget=5), (0,3))
+
+        board = [[X,X,X,EMPTY,EMPTY],
+                 [O,O,EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY,EMPTY]]
+        self.assertEqual(tictactoe.minimax(board, mode="deepening", k=4, time_budget=0.5), (0,3))
+
+    def test_deepening_respects_time_budget(self):
+        stats = tictactoe.SearchStats()
+        move = tictactoe.minimax(initial_state(6, 6), stats, mode="deepening", k=4, time_budget=0.2)
+        self.assertIsNotNone(move)
+        self.assertLess(stats.seconds, 1.0)
+        self.assertGreaterEqual(stats.depth, 1)
+
+    def test_deepening_is_optimal_on_3x3(self):
+        board = [[X,O,EMPTY],
+                 [EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY]]
+        move = tictactoe.minimax(board, mode="deepening", time_budget=None)
+        self.assertEqual(tictactoe.alphabeta(tictactoe.result(board, move), -1, 1), 1)
+
+    def test_exact_modes_reject_other_boards(self):
+        with self.assertRaises(ValueError):
+            tictactoe.minimax(initial_state(4, 4))
+
+
+class TestBitboard(unittest.TestCase):
+
+    def test_round_trip(self):
+        board = [[X,O,EMPTY],
+                 [EMPTY,X,EMPTY],
+                 [O,EMPTY,EMPTY]]
+        x, o = bitboard.from_board(board)
+        self.assertEqual((x, o), (0b000010001, 0b001000010))
+        self.assertEqual(bitboard.to_board(x, o), board)
+        self.assertEqual(bitboard.decode(bitboard.encode(x, o)), (x, o))
+
+    def test_rules_match_list_engine(self):
+        boards = [initial_state(),
+                  [[X,X,X],[O,O,X],[O,EMPTY,EMPTY]],
+                  [[EMPTY,O,X],[O,O,X],[EMPTY,X,X]],
+                  [[X,O,X],[X,O,O],[O,X,X]],
+                  [[X,O,X],[O,X,X],[O,EMPTY,EMPTY]]]
+        for board in boards:
+            x, o = bitboard.from_board(board)
+            self.assertEqual(bitboard.winner(x, o), tictactoe.winner(board))
+            self.assertEqual(bitboard.terminal(x, o), tictactoe.terminal(board))
+            self.assertEqual(bitboard.player(x, o), tictactoe.player(board))
+            self.assertEqual(bitboard.utility(x, o), tictactoe.utility(board))
+
+    def test_minimax(self):
+        self.assertEqual(bitboard.minimax([[X,O,EMPTY],
+                                           [EMPTY,EMPTY,EMPTY],
+                                           [EMPTY,EMPTY,EMPTY]]), (1,1))
+        self.assertEqual(bitboard.minimax([[EMPTY,X,O],
+                                           [O,X,X],
+                                           [X,EMPTY,O]]), (2,1))
+        self.assertEqual(bitboard.minimax([[O,X,O],
+                                           [O,X,X],
+                                           [X,O,X]]), None)
+
+
+
+class TestSolutionTable(unittest.TestCase):
+
+    def test_table_on_disk_matches_solver(self):
+        self.assertEqual(solution_table.read_table(), solution_table.solve())
+
+    def test_table_moves_are_optimal(self):
+        boards = [initial_state(),
+                  [[X,O,EMPTY],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                  [[EMPTY,X,O],[O,X,X],[X,EMPTY,O]],
+                  [[X,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                  [[X,X,O],[EMPTY,O,EMPTY],[EMPTY,EMPTY,EMPTY]]]
+        for board in boards:
+            expected = tictactoe.alphabeta(board, -1, 1)
+            move = tictactoe.minimax(board, mode="table")
+            self.assertEqual(tictactoe.alphabeta(tictactoe.result(board, move), -1, 1), expected)
+
+        self.assertEqual(tictactoe.minimax([[EMPTY,X,O],
+                                            [O,X,X],
+                                            [X,EMPTY,O]], mode="table"), (2,1))
+        self.assertIsNone(tictactoe.minimax([[O,X,O],
+                                             [O,X,X],
+                                             [X,O,X]], mode="table"))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            tictactoe.minimax(initial_state(), mode="guess")
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_same_move_for_any_number_of_workers(self):
+        board = initial_state(4, 4)
+        board[1][1] = X
+        for seed in (None, 0, 7):
+            moves = {tictactoe.minimax(board, mode="parallel", depth=3, workers=workers, seed=seed)
+                     for workers in (1, 2, 3)}
+            self.assertEqual(len(moves), 1)
+
+    def test_parallel_is_optimal_on_3x3(self):
+        board = [[X,O,EMPTY],
+                 [EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY]]
+        stats = tictactoe.SearchStats()
+        move = tictactoe.minimax(board, stats, mode="parallel", workers=2, seed=3)
+        self.assertEqual(tictactoe.alphabeta(tictactoe.result(board, move), -1, 1), 1)
+        self.assertEqual(stats.depth, 7)
+        self.assertGreater(stats.nodes, 0)
+
+    def test_parallel_takes_wins(self):
+        board = [[X,X,X,EMPTY],
+                 [O,O,O,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY],
+                 [EMPTY,EMPTY,EMPTY,EMPTY]]
+        self.assertEqual(tictactoe.minimax(board, mode="parallel", depth=2, workers=2, seed=1), (0,3))
+        with self.assertRaises(ValueError):
+            tictactoe.minimax(board, mode="parallel", workers=0)
+
+
+class TestAnalysis(unittest.TestCase):
+
+    def test_batch_matches_search(self):
+        boards = [initial_state(),
+                  [[X,O,EMPTY],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                  [[EMPTY,O,X],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                  [[EMPTY,X,O],[O,X,X],[X,EMPTY,O]],
+                  [[X,X,O],[EMPTY,O,EMPTY],[EMPTY,EMPTY,EMPTY]]]
+        for board, (value, move) in zip(boards, analysis.evaluate_positions(boards)):
+            self.assertEqual(value, tictactoe.alphabeta(board, -1, 1))
+            self.assertEqual(tictactoe.alphabeta(tictactoe.result(board, move), -1, 1), value)
+
+    def test_encoded_positions_and_finished_games(self):
+        won = [[X,X,X],[O,O,EMPTY],[EMPTY,EMPTY,EMPTY]]
+        code = bitboard.encode(*bitboard.from_board(won))
+        self.assertEqual(list(analysis.evaluate_positions([code, won])), [(1, None), (1, None)])
+        with self.assertRaises(ValueError):
+            list(analysis.evaluate_positions([0b1 | 0b1 << 9]))
+
+    def test_impossible_mark_counts(self):
+        for board in ([[X,X,X],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                      [[O,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY],[EMPTY,EMPTY,EMPTY]],
+                      [[X,X,EMPTY],[O,O,O],[EMPTY,EMPTY,EMPTY]]):
+            with self.assertRaises(ValueError):
+                analysis.to_bitboards(board)
+        with self.assertRaises(ValueError):
+            analysis.to_bitboards(0b11)
+        self.assertEqual(analysis.to_bitboards([[X,EMPTY,EMPTY],[EMPTY,O,EMPTY],[EMPTY,EMPTY,X]]),
+                         (0b100000001, 0b000010000))
+
+    def test_symmetric_positions_are_solved_once(self):
+        corners = []
+        for i, j in [(0,0), (0,2), (2,0), (2,2)]:
+            board = initial_state()
+            board[i][j] = X
+            corners.append(board)
+        cache = analysis.PositionCache()
+        results = list(analysis.evaluate_positions(corners * 10, cache=cache))
+        self.assertEqual((cache.misses, cache.hits), (1, 39))
+        for board, (value, move) in zip(corners, results):
+            self.assertEqual(value, 0)
+            self.assertEqual(board[move[0]][move[1]], EMPTY)
+
+
+class TestSearchStats(unittest.TestCase):
+
+    def test_alphabeta_stats(self):
+        tictactoe.reset_transposition_table()
+        stats = tictactoe.SearchStats()
+        move = tictactoe.minimax(initial_state(), stats)
+        self.assertEqual(move, tictactoe.minimax(initial_state()))
+        self.assertGreater(stats.nodes, 0)
+        self.assertGreater(stats.cutoffs, 0)
+        self.assertGreater(stats.cache_hits, 0)
+        self.assertEqual(stats.max_depth, 9)
+        self.assertEqual(set(stats.root_seconds), tictactoe.actions(initial_state()))
+        self.assertEqual(len(stats.summary()), 3)
+
+    def test_other_modes_fill_stats(self):
+        board = initial_state(4, 4)
+        for mode in ("bitboard", "deepening", "parallel"):
+            stats = tictactoe.SearchStats()
+            if mode == "bitboard":
+                tictactoe.minimax(initial_state(), stats, mode=mode)
+            else:
+                tictactoe.minimax(board, stats, mode=mode, time_budget=0.1, depth=2, workers=2)
+            self.assertGreater(stats.nodes, 0, mode)
+            self.assertGreater(stats.max_depth, 0, mode)
+            self.assertTrue(stats.root_seconds, mode)
+
+    def test_merge(self):
+        first, second = tictactoe.SearchStats(), tictactoe.SearchStats()
+        first.visit(2)
+        second.visit(5)
+        second.cutoffs = 3
+        second.root_seconds[(0, 0)] = 0.5
+        first.merge(second)
+        self.assertEqual((first.nodes, first.cutoffs, first.max_depth), (2, 3, 5))
+        self.assertEqual(first.root_seconds, {(0, 0): 0.5})
+
+
+class TestTournament(unittest.TestCase):
+
+    def test_optimal_engines_never_lose(self):
+        report = tournament.run_tournament(["table", "heuristic", "random"], 4, workers=2, seed=1)
+        self.assertEqual(len(report["pairings"]), 6)
+        for pairing in report["pairings"]:
+            self.assertAlmostEqual(pairing["x_wins"] + pairing["o_wins"] + pairing["draws"], 1)
+            if pairing["x"] == "random":
+                self.assertEqual(pairing["x_wins"], 0)
+            elif pairing["o"] == "random":
+                self.assertEqual(pairing["o_wins"], 0)
+            else:
+                self.assertEqual(pairing["draws"], 1)
+        for latency in report["latency"].values():
+            self.assertGreater(latency["moves"], 0)
+            self.assertLessEqual(latency["p50"], latency["max"])
+        with self.assertRaises(ValueError):
+            tournament.run_tournament(["table", "psychic"], 1)
+
         
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -4,26 +4,63 @@ Tic Tac Toe Player
 
 import math
 import copy
+import time
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Transposition table flags: the stored value is exact, or only a lower or
+# upper bound because the search that produced it was cut off
+EXACT = 0
+LOWER = 1
+UPPER = 2
 
-def initial_state():
+# Maps canonical board keys to (value, flag). Positions keep their value
+# from one move to the next, so the table is shared by every minimax call
+# of a session; call reset_transposition_table() to start cold.
+transposition_table = {}
+
+# The 8 symmetries of the 3x3 board as permutations of cell indices 0..8:
+# cell SYMMETRY[k] of the original board goes to cell k of the image
+_ROTATE = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+_MIRROR = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+
+
+def _compose(first, second):
+    return tuple(first[second[k]] for k in range(9))
+
+
+SYMMETRIES = []
+_symmetry = tuple(range(9))
+for _ in range(4):
+    SYMMETRIES.append(_symmetry)
+    SYMMETRIES.append(_compose(_symmetry, _MIRROR))
+    _symmetry = _compose(_symmetry, _ROTATE)
+
+_CELL_DIGIT = {EMPTY: 0, X: 1, O: 2}
+
+
+def initial_state(rows=3, cols=3):
+    """
+    Returns starting state of the board, 3x3 unless another size is given.
+    """
+    return [[EMPTY] * cols for _ in range(rows)]
+
+
+def default_k(board):
     """
-    Returns starting state of the board.
+    Returns the number in a row needed to win when none is given:
+    a full row of the board's shorter side.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return min(len(board), len(board[0]))
 
 
-def player(board:list):
+def player(board:list, k=None):
     """
     Returns player who has the next turn on a board.
     """
-    if terminal(board):
+    if terminal(board, k):
         return EMPTY
     
     numX = 0 
@@ -43,17 +80,17 @@ def player(board:list):
         return EMPTY
 
 
-def actions(board):
+def actions(board, k=None):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
     set_of_all_possible_actions = set()
 
-    if terminal(board):
+    if terminal(board, k):
         return None
 
-    for i in range(3):
-        for j in range(3):
+    for i in range(len(board)):
+        for j in range(len(board[i])):
             if board[i][j] == EMPTY:
                 set_of_all_possible_actions.add(((i,j)))
 
@@ -61,7 +98,7 @@ def actions(board):
 
 
 
-def result(board, action):
+def result(board, action, k=None):
     """
     Returns the board that results from making move (i, j) on the board.
     """
@@ -69,126 +106,559 @@ def result(board, action):
     #Degenerate cases
     if not isinstance(action,tuple):
         raise ValueError
-    if terminal(board):
+    if terminal(board, k):
         raise ValueError
     if board[action[0]][action[1]] is not EMPTY:
         raise ValueError
 
-    player_to_move = player(board)
+    player_to_move = player(board, k)
     newBoard = copy.deepcopy(board)
     newBoard[action[0]][action[1]] = player_to_move
     return newBoard
 
 
-def winner(board):
+def winner(board, k=None):
     """
     Returns the winner of the game, if there is one. Else returns None.
     Assumes no two winners at the same time as that's an invalid board
+
+    A player wins with k of their marks in a row, column or diagonal;
+    k defaults to the length of the board's shorter side.
     """
+    if k is None:
+        k = default_k(board)
+    if len(board) != 3 or len(board[0]) != 3 or k != 3:
+        return _winner_k(board, k)
 
+    #A line of EMPTY cells is not a win, so skip it rather than returning None
     win_by_diag = ( (board[0][0] == board[1][1] and board[1][1] == board[2][2]) 
                       or (board[0][2] == board[1][1] and board[1][1] == board[2][0]) )
-    if(win_by_diag):
+    if(win_by_diag and board[1][1] is not EMPTY):
          return board[1][1]
 
     for row in board:
-        if(row[0] == row[1] and row[1] == row[2]):
+        if(row[0] == row[1] and row[1] == row[2] and row[1] is not EMPTY):
             return row[1]
     
     for i in range(3):
-        if(board[0][i] == board[1][i] and board[1][i] == board[2][i]):
+        if(board[0][i] == board[1][i] and board[1][i] == board[2][i] and board[0][i] is not EMPTY):
             return board[0][i]
 
     return None
 
 
-def terminal(board):
+# Directions a line can run in from its first cell
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def _winner_k(board, k):
+    """
+    Returns the player with k in a row on a board of any size, else None.
+    """
+    rows, cols = len(board), len(board[0])
+    for i in range(rows):
+        for j in range(cols):
+            cell = board[i][j]
+            if cell is EMPTY:
+                continue
+            for di, dj in DIRECTIONS:
+                end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                if not (0 <= end_i < rows and 0 <= end_j < cols):
+                    continue
+                if all(board[i + step * di][j + step * dj] == cell for step in range(1, k)):
+                    return cell
+    return None
+
+
+def wins_through(board, i, j, k):
+    """
+    Returns True if the mark at (i, j) is part of k in a row.
+    Only the lines through the last move need checking after it is played.
+    """
+    cell = board[i][j]
+    rows, cols = len(board), len(board[0])
+    for di, dj in DIRECTIONS:
+        count = 1
+        for sign in (1, -1):
+            a, b = i + sign * di, j + sign * dj
+            while 0 <= a < rows and 0 <= b < cols and board[a][b] == cell:
+                count += 1
+                a, b = a + sign * di, b + sign * dj
+        if count >= k:
+            return True
+    return False
+
+
+def terminal(board, k=None):
     """
     Returns True if game is over, False otherwise.
     """
 
-    if winner(board) is not None:
+    if winner(board, k) is not None:
         return True
 
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
+    for row in board:
+        for cell in row:
+            if cell == EMPTY:
                 return False
     return True
     
 
 
-def utility(board):
+def utility(board, k=None):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     Assume terminal board is given
     """
-    if winner(board) == X:
+    winning_player = winner(board, k)
+    if winning_player == X:
         return 1
-    elif winner(board) == O:
+    elif winning_player == O:
         return -1
     else:
         return 0
 
-def minimax(board) -> tuple:
+
+class SearchStats():
     """
-    Returns the optimal action for the current player on the board.
+    Work done by a minimax call. Searches only count when a SearchStats is
+    passed in, so leaving it out costs nothing.
+
+        nodes         positions visited
+        cutoffs       alpha-beta cutoffs
+        cache_hits    transposition table entries that ended a search
+        max_depth     deepest ply below the root visited
+        seconds       wall time
+        depth         deepest fully searched depth, for iterative deepening
+        root_seconds  maps each root action to the time spent searching it
     """
-    currentPlayer = player(board)
-    tryingToMaximize = True    
+    def __init__(self):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.cache_hits = 0
+        self.max_depth = 0
+        self.seconds = 0.0
+        self.depth = 0
+        self.root_seconds = {}
+
+    def visit(self, ply):
+        self.nodes += 1
+        if ply > self.max_depth:
+            self.max_depth = ply
+
+    def time_root(self, action, start):
+        """
+        Adds the time since perf_counter() returned start to a root action.
+        """
+        elapsed = time.perf_counter() - start
+        self.root_seconds[action] = self.root_seconds.get(action, 0.0) + elapsed
+
+    def merge(self, other):
+        """
+        Adds the counts of another SearchStats, such as a worker process's.
+        """
+        self.nodes += other.nodes
+        self.cutoffs += other.cutoffs
+        self.cache_hits += other.cache_hits
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for action, seconds in other.root_seconds.items():
+            self.root_seconds[action] = self.root_seconds.get(action, 0.0) + seconds
+
+    def summary(self):
+        """
+        Returns the stats as a few short lines of text.
+        """
+        lines = [
+            f"{self.nodes} nodes, {self.cutoffs} cutoffs, {self.cache_hits} cache hits",
+            f"max depth {self.max_depth}, {self.seconds * 1000:.1f} ms",
+        ]
+        if self.root_seconds:
+            action, seconds = max(self.root_seconds.items(), key=lambda item: item[1])
+            lines.append(f"slowest root action {action}: {seconds * 1000:.1f} ms")
+        return lines
+
+
+def canonical_key(board):
+    """
+    Returns a base 3 integer encoding of the board that is the same
+    for all 8 rotations and reflections of it.
+    """
+    cells = [_CELL_DIGIT[cell] for row in board for cell in row]
+    best = None
+    for symmetry in SYMMETRIES:
+        key = 0
+        for k in symmetry:
+            key = key * 3 + cells[k]
+        if best is None or key < best:
+            best = key
+    return best
+
+
+def minimax_value(board, stats=None, ply=0):
+    """
+    Returns the minimax value of the board by searching the whole game
+    tree, without pruning or a transposition table.
+    """
+    if stats is not None:
+        stats.visit(ply)
 
-    if currentPlayer == O:
-        tryingToMaximize = False
-    elif currentPlayer == X:
-        tryingToMaximize = True
-    else:
-        return None
-    
+    if terminal(board):
+        return utility(board)
+    if player(board) == X:
+        return max(minimax_value(result(board, action), stats, ply + 1) for action in actions(board))
+    return min(minimax_value(result(board, action), stats, ply + 1) for action in actions(board))
+
+
+def reset_transposition_table():
+    transposition_table.clear()
 
-    def max_value(board) -> tuple:
-    
-        if terminal(board):
-            return utility(board),None
-        
-        highest_value = -math.inf
-        optimalAction = None
 
+def alphabeta(board, alpha, beta, stats=None, ply=0):
+    """
+    Returns the minimax value of the board, searching with an
+    (alpha, beta) window. A result <= alpha is an upper bound and a
+    result >= beta is a lower bound; anything in between is exact.
+    ply is the board's distance from the root, for stats.max_depth.
+    """
+    if stats is not None:
+        stats.visit(ply)
+
+    if terminal(board):
+        return utility(board)
+
+    key = canonical_key(board)
+    entry = transposition_table.get(key)
+    if entry is not None:
+        value, flag = entry
+        if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+            if stats is not None:
+                stats.cache_hits += 1
+            return value
+
+    original_alpha, original_beta = alpha, beta
+    if player(board) == X:
+        best = -math.inf
         for action in actions(board):
-            val,act = min_value(result(board,action))
-            if(val > highest_value):
-                highest_value = val
-                optimalAction = action
+            best = max(best, alphabeta(result(board, action), alpha, beta, stats, ply + 1))
+            alpha = max(alpha, best)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+    else:
+        best = math.inf
+        for action in actions(board):
+            best = min(best, alphabeta(result(board, action), alpha, beta, stats, ply + 1))
+            beta = min(beta, best)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                break
+
+    if best <= original_alpha:
+        flag = UPPER
+    elif best >= original_beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table[key] = (best, flag)
+    return best
 
-                if highest_value == 1: #if this action makes me win TAKE IT! optimization
-                    return highest_value,optimalAction
-                
-        return highest_value,optimalAction
 
-    def min_value(board) -> tuple:
+class SearchTimeout(Exception):
+    """
+    Raised inside a depth-limited search when its time budget runs out.
+    """
 
-        if terminal(board):
-            return utility(board),None
 
-        lowest_value = math.inf
-        optimalAction = None
+# Maps (rows, cols, k) to every line of k cells on such a board
+_windows = {}
 
-        for action in actions(board):
-            val,act  = max_value(result(board,action))
-            if(val < lowest_value):
-                lowest_value = val
-                optimalAction = action
 
-                if lowest_value == -1:
-                    return lowest_value,optimalAction
-                
-        return lowest_value,optimalAction
+def windows(rows, cols, k):
+    """
+    Returns every line of k cells, as lists of (i, j), on a rows x cols board.
+    """
+    key = (rows, cols, k)
+    if key not in _windows:
+        lines = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in DIRECTIONS:
+                    end_i, end_j = i + (k - 1) * di, j + (k - 1) * dj
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        lines.append([(i + step * di, j + step * dj) for step in range(k)])
+        _windows[key] = lines
+    return _windows[key]
+
+
+def line_heuristic(board, k):
+    """
+    Scores a non-terminal board between -1 and 1 from X's point of view.
+    Every line of k cells that only one player has marks in counts for
+    that player, more the more marks it already has.
+    """
+    score = 0
+    for line in windows(len(board), len(board[0]), k):
+        xs = os = 0
+        for i, j in line:
+            if board[i][j] == X:
+                xs += 1
+            elif board[i][j] == O:
+                os += 1
+        if os == 0 and xs:
+            score += 4 ** xs
+        elif xs == 0 and os:
+            score -= 4 ** os
+    return score / (abs(score) + 4 ** k)
+
+
+def ordered_moves(board):
+    """
+    Returns the empty cells of a board, closest to the centre first.
+    """
+    rows, cols = len(board), len(board[0])
+    centre_i, centre_j = (rows - 1) / 2, (cols - 1) / 2
+    cells = [(i, j) for i in range(rows) for j in range(cols) if board[i][j] == EMPTY]
+    cells.sort(key=lambda cell: (abs(cell[0] - centre_i) + abs(cell[1] - centre_j), cell))
+    return cells
+
 
-    
-    if tryingToMaximize:
-        val,optimalAction = max_value(board)
-    else:
-        val,optimalAction = min_value(board)
+def depth_limited(board, k, depth, alpha, beta, maximizing, moves, evaluate,
+                  deadline=None, stats=None, ply=1):
+    """
+    Returns the alpha-beta value of a non-terminal board, searched depth
+    moves deep and scored with evaluate beyond that. The board is changed
+    in place while searching and restored before returning. Wins score
+    above 1, higher the sooner they come, so they outrank any heuristic.
+    Raises SearchTimeout once the perf_counter deadline has passed.
+    """
+    if stats is not None:
+        stats.visit(ply)
+    if deadline is not None and time.perf_counter() > deadline:
+        raise SearchTimeout
+    if depth == 0:
+        return evaluate(board, k)
+
+    mark = X if maximizing else O
+    best = -math.inf if maximizing else math.inf
+    total = len(board) * len(board[0])
+    for index, (i, j) in enumerate(moves):
+        board[i][j] = mark
+        if wins_through(board, i, j, k):
+            value = 1 + (len(moves) - 1) / total
+            if not maximizing:
+                value = -value
+        elif len(moves) == 1:
+            value = 0
+        else:
+            remaining = moves[:index] + moves[index + 1:]
+            try:
+                value = depth_limited(board, k, depth - 1, alpha, beta, not maximizing,
+                                      remaining, evaluate, deadline, stats, ply + 1)
+            except SearchTimeout:
+                board[i][j] = EMPTY
+                raise
+        board[i][j] = EMPTY
+
+        if maximizing:
+            best = max(best, value)
+            alpha = max(alpha, best)
+        else:
+            best = min(best, value)
+            beta = min(beta, best)
+        if alpha >= beta:
+            if stats is not None:
+                stats.cutoffs += 1
+            break
+    return best
+
+
+def iterative_deepening(board, k=None, time_budget=1.0, evaluate=None, max_depth=None, stats=None):
+    """
+    Returns the best action found for the current player on a board of any
+    size, searching one move deeper at a time until time_budget seconds
+    have passed or the game tree is exhausted. The move from the deepest
+    completed search is returned, and it is tried first in the next one.
 
+    evaluate(board, k) scores boards at the depth limit between -1 and 1
+    from X's point of view; line_heuristic is used by default.
+    """
+    if k is None:
+        k = default_k(board)
+    if evaluate is None:
+        evaluate = line_heuristic
+    start = time.perf_counter()
+    deadline = None if time_budget is None else start + time_budget
+
+    currentPlayer = player(board, k)
+    if currentPlayer is EMPTY:
+        return None
+    maximizing = currentPlayer == X
+
+    work = [row[:] for row in board]
+    moves = ordered_moves(work)
+    if max_depth is None or max_depth > len(moves):
+        max_depth = len(moves)
+    optimalAction = moves[0]
+    try:
+        for depth in range(1, max_depth + 1):
+            value, action = _search_root(work, k, depth, maximizing, moves, evaluate, deadline, stats)
+            optimalAction = action
+            if stats is not None:
+                stats.depth = depth
+            moves.remove(action)
+            moves.insert(0, action)
+            if abs(value) > 1:
+                break
+    except SearchTimeout:
+        pass
+
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
     return optimalAction
 
-    
+
+def _search_root(board, k, depth, maximizing, moves, evaluate, deadline, stats):
+    """
+    Searches every root move to depth. Returns (value, action) of the best.
+    """
+    alpha, beta = -math.inf, math.inf
+    best_value = None
+    best_action = None
+    for index, action in enumerate(moves):
+        remaining = moves[:index] + moves[index + 1:]
+        if stats is not None:
+            action_start = time.perf_counter()
+        value = root_move_value(board, k, depth, action, maximizing, remaining,
+                                evaluate, alpha, beta, deadline, stats)
+        if stats is not None:
+            stats.time_root(action, action_start)
+        if best_value is None or (value > best_value if maximizing else value < best_value):
+            best_value, best_action = value, action
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+    return best_value, best_action
+
+
+def root_move_value(board, k, depth, action, maximizing, remaining, evaluate,
+                     alpha, beta, deadline, stats):
+    """
+    Returns the value of playing action at the root, searched to depth.
+    """
+    i, j = action
+    board[i][j] = X if maximizing else O
+    try:
+        if wins_through(board, i, j, k):
+            total = len(board) * len(board[0])
+            value = 1 + len(remaining) / total
+            return value if maximizing else -value
+        if not remaining:
+            return 0
+        return depth_limited(board, k, depth - 1, alpha, beta, not maximizing,
+                             remaining, evaluate, deadline, stats)
+    finally:
+        board[i][j] = EMPTY
+
+
+MODES = ("plain", "alphabeta", "bitboard", "table", "deepening", "parallel")
+
+
+def minimax(board, stats=None, mode="alphabeta", k=None, time_budget=1.0, evaluate=None,
+            depth=None, workers=None, seed=None) -> tuple:
+    """
+    Returns the optimal action for the current player on the board.
+
+    Modes:
+        "plain"      full minimax search without pruning, as a reference
+        "alphabeta"  alpha-beta search over the shared transposition table
+        "bitboard"   the same search on the bitboard engine
+        "table"      lookup in the precomputed solution table
+        "deepening"  iterative deepening within time_budget seconds, for
+                     boards of any size with k in a row (see
+                     iterative_deepening); the move is the best found,
+                     optimal only if the whole tree was searched
+        "parallel"   a depth moves deep search (the whole game by default)
+                     with the root moves split across workers processes;
+                     the same move for the same seed whatever the number
+                     of workers (see parallel.parallel_search)
+
+    Only "deepening" and "parallel" support boards other than 3x3 with 3 in a row.
+    If a SearchStats is given, the work done is added to it (see SearchStats).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown minimax mode {mode!r}")
+    if mode == "deepening":
+        return iterative_deepening(board, k, time_budget, evaluate, stats=stats)
+    if mode == "parallel":
+        import parallel
+        return parallel.parallel_search(board, k, depth, workers, seed, evaluate, stats)
+    if len(board) != 3 or len(board[0]) != 3 or k not in (None, 3):
+        raise ValueError(f"Mode {mode!r} only plays 3x3 boards with 3 in a row")
+    if mode == "bitboard":
+        import bitboard
+        return bitboard.minimax(board, stats)
+
+    start = time.perf_counter()
+    currentPlayer = player(board)
+    if currentPlayer is EMPTY:
+        return None
+
+    if mode == "table":
+        # Imported here so the table is only read by games that use it
+        import solution_table
+        optimalAction = solution_table.best_move(board)
+        if stats is not None:
+            stats.seconds += time.perf_counter() - start
+        return optimalAction
+
+    if mode == "plain":
+        optimalAction = None
+        best = None
+        for action in actions(board):
+            if stats is not None:
+                action_start = time.perf_counter()
+            val = minimax_value(result(board, action), stats, 1)
+            if stats is not None:
+                stats.time_root(action, action_start)
+            if best is None or (val > best if currentPlayer == X else val < best):
+                best, optimalAction = val, action
+        if stats is not None:
+            stats.seconds += time.perf_counter() - start
+        return optimalAction
+
+    # Utilities are -1, 0 or 1, so the search window never needs to be wider
+    alpha, beta = -1, 1
+    optimalAction = None
+    if currentPlayer == X:
+        highest_value = -math.inf
+        for action in actions(board):
+            if stats is not None:
+                action_start = time.perf_counter()
+            val = alphabeta(result(board, action), max(alpha, highest_value), beta, stats, 1)
+            if stats is not None:
+                stats.time_root(action, action_start)
+            if val > highest_value:
+                highest_value = val
+                optimalAction = action
+                if highest_value >= beta: #if this action makes me win TAKE IT!
+                    break
+    else:
+        lowest_value = math.inf
+        for action in actions(board):
+            if stats is not None:
+                action_start = time.perf_counter()
+            val = alphabeta(result(board, action), alpha, min(beta, lowest_value), stats, 1)
+            if stats is not None:
+                stats.time_root(action, action_start)
+            if val < lowest_value:
+                lowest_value = val
+                optimalAction = action
+                if lowest_value <= alpha:
+                    break
+
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
+    return optimalAction
@@ -0,0 +1,155 @@
+"""
+Headless Tic Tac Toe tournament
+
+Plays games between engine configurations without the pygame UI, spread
+over a pool of worker processes, and reports each pairing's win and draw
+rates and each engine's per-move latency. Every engine but "random" plays
+optimally or deterministically, so a faster engine that loses games it
+used to draw, or draws games it used to win, stands out.
+
+Usage: python tournament.py [--engines NAME ...] [--games N] [--workers W]
+                            [--seed S] [--output report.json]
+    Every ordered pair of engines plays N games, the first as X.
+    Engines: plain, alphabeta, bitboard, table, heuristic, random.
+    "plain" takes seconds per opening move, so it only plays when listed.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import tictactoe as ttt
+
+ENGINES = ("plain", "alphabeta", "bitboard", "table", "heuristic", "random")
+DEFAULT_ENGINES = ("alphabeta", "table", "heuristic", "random")
+
+# Depth of the "heuristic" engine's search, beyond which line_heuristic scores
+HEURISTIC_DEPTH = 2
+
+
+def choose_move(engine, board, rng):
+    """
+    Returns the move engine plays on board.
+    """
+    if engine == "random":
+        return rng.choice(sorted(ttt.actions(board)))
+    if engine == "heuristic":
+        return ttt.iterative_deepening(board, time_budget=None, max_depth=HEURISTIC_DEPTH)
+    if engine in ("plain", "alphabeta", "bitboard", "table"):
+        return ttt.minimax(board, mode=engine)
+    raise ValueError(f"Unknown engine {engine!r}")
+
+
+def play_game(game):
+    """
+    Plays one game of (x_engine, o_engine, seed).
+    Returns (x_engine, o_engine, winner, {engine: [seconds per move]}).
+    """
+    x_engine, o_engine, seed = game
+    rng = random.Random(seed)
+    engines = {ttt.X: x_engine, ttt.O: o_engine}
+    latencies = {x_engine: [], o_engine: []}
+    board = ttt.initial_state()
+    while not ttt.terminal(board):
+        engine = engines[ttt.player(board)]
+        start = time.perf_counter()
+        move = choose_move(engine, board, rng)
+        latencies[engine].append(time.perf_counter() - start)
+        board = ttt.result(board, move)
+    return x_engine, o_engine, ttt.winner(board), latencies
+
+
+def percentile(values, fraction):
+    """
+    Returns the nearest-rank percentile of sorted values.
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def run_tournament(engines, games, workers=None, seed=0):
+    """
+    Plays games games for every ordered pair of engines on a pool of worker
+    processes. Returns a report dictionary.
+    """
+    if games < 1:
+        raise ValueError("games must be at least 1")
+    for engine in engines:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}")
+    pairings = list(itertools.permutations(engines, 2))
+    tasks = [(x_engine, o_engine, seed * 1000003 + n)
+             for n, (x_engine, o_engine) in enumerate(
+                 pairing for pairing in pairings for _ in range(games))]
+
+    results = {pairing: {"X": 0, "O": 0, "draw": 0} for pairing in pairings}
+    latencies = {engine: [] for engine in engines}
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers or os.cpu_count() or 1) as pool:
+        for x_engine, o_engine, winner, game_latencies in pool.imap_unordered(play_game, tasks):
+            results[x_engine, o_engine]["draw" if winner is None else winner] += 1
+            for engine, seconds in game_latencies.items():
+                latencies[engine].extend(seconds)
+
+    report = {"games_per_pairing": games, "seed": seed, "pairings": [], "latency": {}}
+    for (x_engine, o_engine), counts in results.items():
+        report["pairings"].append({
+            "x": x_engine,
+            "o": o_engine,
+            "x_wins": counts["X"] / games,
+            "o_wins": counts["O"] / games,
+            "draws": counts["draw"] / games,
+        })
+    for engine, seconds in latencies.items():
+        seconds.sort()
+        report["latency"][engine] = {
+            "moves": len(seconds),
+            "p50": percentile(seconds, 0.5),
+            "p90": percentile(seconds, 0.9),
+            "p99": percentile(seconds, 0.99),
+            "max": seconds[-1] if seconds else None,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'X':>10} {'O':>10} {'X wins':>7} {'O wins':>7} {'draws':>7}")
+    for pairing in report["pairings"]:
+        print(f"{pairing['x']:>10} {pairing['o']:>10} {pairing['x_wins']:>7.1%} "
+              f"{pairing['o_wins']:>7.1%} {pairing['draws']:>7.1%}")
+    print()
+    print(f"{'engine':>10} {'moves':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for engine, latency in report["latency"].items():
+        if not latency["moves"]:
+            continue
+        print(f"{engine:>10} {latency['moves']:>7} " + " ".join(
+            f"{latency[key] * 1000:>9.3f}" for key in ("p50", "p90", "p99", "max")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Tic Tac Toe tournament.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(DEFAULT_ENGINES))
+    parser.add_argument("--games", type=int, default=10, help="games per ordered pair of engines")
+    parser.add_argument("--workers", type=int, default=None, help="processes to play on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the report as JSON here")
+    args = parser.parse_args()
+
+    if len(args.engines) < 2:
+        parser.error("at least two engines are needed")
+    report = run_tournament(args.engines, args.games, args.workers, args.seed)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()